@@ -0,0 +1,465 @@
+import os
+import random
+import itertools
+
+from config import system_prompt, model_name
+from functions import allowed_functions
+from functions.allowed_functions import DIRECTIONS
+from functions.pathfinding import FREE, breadth_first_search, path_directions
+import plain_types
+from prompt_cache import PromptCache
+from response_cache import ResponseCache
+from scheduler import RequestScheduler
+
+class Backend:
+    """
+    Source of model responses for the step loop.
+
+    generate returns an object shaped like types.GenerateContentResponse, i.e. with
+    candidates, function_calls, usage_metadata and text. The messages of the episodes
+    run with a backend are built with its message_types, see start_episode.
+    """
+    name = 'backend'
+
+    @property
+    def message_types(self):
+        """
+        Module the messages are built with, google.genai.types by default.
+        """
+        return plain_types.sdk_types()
+
+    def generate(self, messages: list, state=None):
+        """
+        Generates a response for the current set of messages.
+
+        Parameters
+        ----------
+        messages : list
+            list of messages used
+        state : EpisodeState, optional
+            State of the episode the messages belong to.
+
+        Returns
+        -------
+        response
+            response from the model.
+        """
+        raise NotImplementedError
+
+    async def agenerate(self, messages: list, state=None):
+        """
+        Same as generate, for use in an event loop.
+        """
+        return self.generate(messages, state)
+
+    def stream(self, messages: list, state=None):
+        """
+        Generates a response in chunks, each shaped like a response. Without streaming
+        support the whole response is the only chunk.
+
+        Parameters
+        ----------
+        messages : list
+            list of messages used
+        state : EpisodeState, optional
+            State of the episode the messages belong to.
+
+        Yields
+        ------
+        response
+            Chunks of the response, merge_chunks combines them into the whole response.
+        """
+        yield self.generate(messages, state)
+
+    async def astream(self, messages: list, state=None):
+        """
+        Same as stream, for use in an event loop.
+        """
+        yield await self.agenerate(messages, state)
+
+class GeminiBackend(Backend):
+    """
+    Responses from the Gemini API.
+
+    Requests that are not answered from the cache go through the scheduler, if given,
+    which keeps them within the rate limits and retries them on errors. With a prompt
+    cache, the system prompt, tools and user prompt are referenced from cached content
+    instead of being sent with every request.
+    """
+    name = 'gemini'
+
+    def __init__(self, client: 'genai.Client | None', model: str = model_name, cache: ResponseCache | None = None, scheduler: RequestScheduler | None = None, prompt_cache: PromptCache | None = None):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.scheduler = scheduler
+        self.prompt_cache = prompt_cache
+
+    def _config(self) -> 'types.GenerateContentConfig':
+        from google.genai import types
+        return types.GenerateContentConfig(
+            tools=[allowed_functions.available_functions],
+            system_instruction=system_prompt,
+        )
+
+    def _request(self, messages: list) -> 'tuple[list, types.GenerateContentConfig]':
+        # contents and config of a request, referencing the prompt cache if there is one
+        if self.prompt_cache is None:
+            return messages, self._config()
+        prompt = PromptCache.prompt(messages)
+        name = self.prompt_cache.name(prompt) if prompt is not None else None
+        return self.prompt_cache.request(name, messages)
+
+    async def _arequest(self, messages: list) -> 'tuple[list, types.GenerateContentConfig]':
+        if self.prompt_cache is None:
+            return messages, self._config()
+        prompt = PromptCache.prompt(messages)
+        name = await self.prompt_cache.aname(prompt) if prompt is not None else None
+        return self.prompt_cache.request(name, messages)
+
+    def _cached(self, messages: list) -> 'tuple[str | None, types.GenerateContentResponse | None]':
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(messages, self.model, [allowed_functions.available_functions], system_prompt)
+        return key, self.cache.get(key)
+
+    def generate(self, messages: list, state=None):
+        key, response = self._cached(messages)
+        if response is not None:
+            return response
+
+        contents, config = self._request(messages)
+
+        def request():
+            return self.client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=config,
+            )
+
+        if self.scheduler is not None:
+            response = self.scheduler.run(request, contents, deadline=getattr(state, 'deadline', None))
+        else:
+            response = request()
+
+        if self.cache is not None:
+            self.cache.put(key, response)
+        return response
+
+    async def agenerate(self, messages: list, state=None):
+        key, response = self._cached(messages)
+        if response is not None:
+            return response
+
+        contents, config = await self._arequest(messages)
+
+        def request():
+            return self.client.aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=config,
+            )
+
+        if self.scheduler is not None:
+            response = await self.scheduler.arun(request, contents, deadline=getattr(state, 'deadline', None))
+        else:
+            response = await request()
+
+        if self.cache is not None:
+            self.cache.put(key, response)
+        return response
+
+    def stream(self, messages: list, state=None):
+        key, response = self._cached(messages)
+        if response is not None:
+            yield response
+            return
+
+        contents, config = self._request(messages)
+
+        def request():
+            chunks = self.client.models.generate_content_stream(
+                model=self.model,
+                contents=contents,
+                config=config,
+            )
+            # the request is sent when the first chunk is taken, so the scheduler retries failures up to here
+            return next(chunks, None), chunks
+
+        if self.scheduler is not None:
+            # the token counts are only known after the last chunk, so the scheduler is corrected below
+            first, chunks = self.scheduler.run(request, contents, deadline=getattr(state, 'deadline', None), settle=False)
+        else:
+            first, chunks = request()
+
+        received = []
+        if first is not None:
+            for chunk in itertools.chain([first], chunks):
+                received.append(chunk)
+                yield chunk
+
+        response = merge_chunks(received)
+        if self.scheduler is not None:
+            self.scheduler.settle(response, contents)
+        if self.cache is not None:
+            self.cache.put(key, response)
+
+    async def astream(self, messages: list, state=None):
+        key, response = self._cached(messages)
+        if response is not None:
+            yield response
+            return
+
+        contents, config = await self._arequest(messages)
+
+        async def request():
+            chunks = await self.client.aio.models.generate_content_stream(
+                model=self.model,
+                contents=contents,
+                config=config,
+            )
+            return await anext(chunks, None), chunks
+
+        if self.scheduler is not None:
+            first, chunks = await self.scheduler.arun(request, contents, deadline=getattr(state, 'deadline', None), settle=False)
+        else:
+            first, chunks = await request()
+
+        received = []
+        if first is not None:
+            received.append(first)
+            yield first
+            async for chunk in chunks:
+                received.append(chunk)
+                yield chunk
+
+        response = merge_chunks(received)
+        if self.scheduler is not None:
+            self.scheduler.settle(response, contents)
+        if self.cache is not None:
+            self.cache.put(key, response)
+
+def merge_chunks(chunks: list, types=None) -> 'types.GenerateContentResponse':
+    """
+    Combines the chunks of a streamed response into one response.
+
+    The parts of all chunks are joined in order, consecutive text parts into one part.
+    Token counts are taken from the last chunk that has them.
+
+    Parameters
+    ----------
+    chunks : list
+        Chunks of the response.
+    types : module, optional
+        Module the response is built with, that of the chunks; google.genai.types if not given.
+
+    Returns
+    -------
+    types.GenerateContentResponse
+        The whole response, without candidates if no chunk had one.
+    """
+    types = types if types is not None else plain_types.sdk_types()
+
+    parts = []
+    finish_reason = None
+    usage_metadata = None
+    for chunk in chunks:
+        if chunk.usage_metadata is not None:
+            usage_metadata = chunk.usage_metadata
+        if not chunk.candidates:
+            continue
+        candidate = chunk.candidates[0]
+        finish_reason = candidate.finish_reason or finish_reason
+        for part in (candidate.content.parts if candidate.content is not None else None) or []:
+            previous = parts[-1] if parts else None
+            if (previous is not None and part.text is not None and previous.text is not None
+                    and part.function_call is None and previous.function_call is None
+                    and part.thought == previous.thought and getattr(part, 'thought_signature', None) is None):
+                parts[-1] = previous.model_copy(update={'text': previous.text + part.text})
+            else:
+                parts.append(part)
+
+    candidates = []
+    if parts or finish_reason is not None:
+        candidates = [types.Candidate(content=types.Content(role="model", parts=parts), finish_reason=finish_reason)]
+    return types.GenerateContentResponse(candidates=candidates, usage_metadata=usage_metadata)
+
+def scripted_response(function_calls: list[str] | None = None, text: str | None = None) -> 'types.GenerateContentResponse':
+    """
+    Builds a response in the same shape as one from the Gemini API, with the classes of plain_types.
+
+    Parameters
+    ----------
+    function_calls : list[str], optional
+        Names of the functions called, without arguments.
+    text : str, optional
+        Text of the response.
+
+    Returns
+    -------
+    types.GenerateContentResponse
+        The response.
+    """
+    types = plain_types
+
+    parts = [types.Part.from_function_call(name=name, args={}) for name in function_calls or []]
+    if text is not None:
+        parts.append(types.Part(text=text))
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=0,
+            candidates_token_count=0,
+            total_token_count=0,
+        ),
+    )
+
+class ScriptedBackend(Backend):
+    """
+    Local stand-in for the model that drives the drone with a fixed strategy.
+
+    It only uses what the tools reveal to the model (drone and target position, known map)
+    and only calls functions declared in available_functions.
+
+    Strategies
+    ----------
+    'frontier'
+        Walks the shortest known path to the target, or to the nearest known free cell next
+        to unknown cells while the target cannot be reached on the known map.
+    'random'
+        Moves in a random walkable direction.
+    """
+    name = 'scripted'
+    STRATEGIES = ('frontier', 'random')
+    # the scripted backends send no request, their messages do not need the Gemini SDK
+    message_types = plain_types
+
+    def __init__(self, strategy: str = 'frontier', seed: int | None = None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Unknown strategy: {strategy}')
+        missing = set(f'move_{direction}' for direction in DIRECTIONS) - set(allowed_functions.function_names)
+        if missing:
+            raise ValueError(f'Tools not declared: {sorted(missing)}')
+        self.strategy = strategy
+        self.random = random.Random(seed)
+
+    def generate(self, messages: list, state=None):
+        if state is None:
+            raise ValueError('The scripted backend needs the state of the episode')
+        if state.reached_target:
+            return scripted_response(text='The drone reached the target.')
+
+        if self.strategy == 'random':
+            direction = self._random_direction(state)
+        else:
+            direction = self._frontier_direction(state)
+
+        if direction is None:
+            return scripted_response(text='The target cannot be reached.')
+        return scripted_response([f'move_{direction}'])
+
+    def _random_direction(self, state) -> str | None:
+        drone_map = state.drone_map
+        x_drone, y_drone = state.drone_position
+        walkable = [
+            direction for direction, (dx, dy) in DIRECTIONS.items()
+            if drone_map.inside(x_drone + dx, y_drone + dy) and drone_map.get(x_drone + dx, y_drone + dy) == ' '
+        ]
+        return self.random.choice(walkable) if walkable else None
+
+    def _frontier_direction(self, state) -> str | None:
+        drone_map = state.drone_map
+        target = drone_map.index(*state.target_position)
+
+        # go to the target if the known map already contains a way there
+        if drone_map.cells[target] == FREE:
+            _, parent, found = breadth_first_search(drone_map, state.drone_position, stop=lambda index: index == target)
+            if found is not None:
+                return path_directions(drone_map, parent, found)[0]
+
+        # otherwise explore the nearest free cell that has unknown cells around it
+        cells, columns, rows = drone_map.cells, drone_map.columns, drone_map.rows
+        unknown = ord('?')
+
+        # only the four direct neighbours count, they are seen from the cell with any
+        # visibility, diagonal cells may stay hidden behind walls
+        def next_to_unknown(index: int) -> bool:
+            x, y = divmod(index, columns)
+            return (
+                (x > 0 and cells[index - columns] == unknown)
+                or (x < rows - 1 and cells[index + columns] == unknown)
+                or (y > 0 and cells[index - 1] == unknown)
+                or (y < columns - 1 and cells[index + 1] == unknown)
+            )
+
+        start = drone_map.index(*state.drone_position)
+        _, parent, found = breadth_first_search(drone_map, state.drone_position, stop=lambda index: index != start and next_to_unknown(index))
+        if found is None:
+            return None
+        return path_directions(drone_map, parent, found)[0]
+
+# names of the backends that can be chosen on the command line
+BACKENDS = ('gemini', 'frontier', 'random')
+
+def create_client(name: str, cache_mode: str | None = None) -> 'genai.Client | None':
+    """
+    Creates the client of a backend by its command line name.
+
+    Only the Gemini backend imports the Gemini SDK and dotenv, the scripted backends
+    never send a request and get no client.
+
+    Parameters
+    ----------
+    name : str
+        One of BACKENDS.
+    cache_mode : str, optional
+        Mode of the response cache, replaying from it works without an API key.
+
+    Returns
+    -------
+    genai.Client or None
+        The client, None for the scripted backends and for replaying without an API key.
+    """
+    if name != 'gemini':
+        return None
+
+    from dotenv import load_dotenv
+    from google import genai
+
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key == None and cache_mode != 'replay':
+        raise RuntimeError("Api key not found!")
+    return genai.Client(api_key=api_key) if api_key != None else None
+
+def create_backend(name: str, client: 'genai.Client | None' = None, cache: ResponseCache | None = None, seed: int | None = None, scheduler: RequestScheduler | None = None, model: str = model_name, prompt_cache: PromptCache | None = None) -> Backend:
+    """
+    Creates a backend by its command line name.
+
+    Parameters
+    ----------
+    name : str
+        One of BACKENDS.
+    client : genai.Client, optional
+        Client used by the Gemini backend.
+    cache : ResponseCache, optional
+        Response cache used by the Gemini backend.
+    seed : int, optional
+        Seed of the scripted backends.
+    scheduler : RequestScheduler, optional
+        Rate limits and retries of the Gemini backend.
+    model : str, optional
+        Model used by the Gemini backend.
+    prompt_cache : PromptCache, optional
+        Cached system prompt, tools and user prompt of the Gemini backend.
+
+    Returns
+    -------
+    Backend
+        The backend.
+    """
+    if name == 'gemini':
+        return GeminiBackend(client, model=model, cache=cache, scheduler=scheduler, prompt_cache=prompt_cache)
+    if name in ScriptedBackend.STRATEGIES:
+        return ScriptedBackend(name, seed=seed)
+    raise ValueError(f'Unknown backend: {name}')
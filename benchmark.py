@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+from functions.allowed_functions import check_walkable, move_north, move_south, move_west, move_east, update_map
+from functions.call_function import call_function
+from functions.grid import Grid
+from episode import create_drone_map, start_episode
+from level_generator import generate_field
+from level_io import load_level, write_level
+from renderer import show_level
+from config import user_prompt
+
+DEFAULT_SIZES = (10, 100, 500, 1000, 2000)
+BASELINE_FILE = 'benchmark_baseline.json'
+
+def benchmark_level(size: int) -> tuple[Grid, list]:
+    """
+    Creates a seeded square level for the benchmarks, with free space around its centre.
+
+    Returns
+    -------
+    (Grid, list)
+        The level and the coordinates of its centre.
+    """
+    level = generate_field(size, size, seed=size, density=0.2)
+    centre = [size // 2, size // 2]
+    for x in range(max(centre[0] - 2, 1), min(centre[0] + 3, size - 1)):
+        for y in range(max(centre[1] - 2, 1), min(centre[1] + 3, size - 1)):
+            level.set(x, y, ' ')
+    return level, centre
+
+def _create_drone_map(level: Grid, centre: list, directory: str):
+    return lambda: create_drone_map(level, centre)
+
+def _update_map(level: Grid, centre: list, directory: str):
+    drone_map = create_drone_map(level, centre)
+    return lambda: update_map(level, drone_map, centre)
+
+def _check_walkable(level: Grid, centre: list, directory: str):
+    drone_map = update_map(level, create_drone_map(level, centre), centre)
+    return lambda: check_walkable(drone_map, centre)
+
+def _move(level: Grid, centre: list, directory: str):
+    drone_map = update_map(level, create_drone_map(level, centre), centre)
+
+    def moves():
+        move_north(drone_map, centre)
+        move_south(drone_map, centre)
+        move_west(drone_map, centre)
+        move_east(drone_map, centre)
+    return moves
+
+def _show_level(level: Grid, centre: list, directory: str):
+    drone_map = update_map(level, create_drone_map(level, centre), centre)
+    return lambda: show_level(drone_map, centre, [1, 1])
+
+def _load_lvl(level: Grid, centre: list, directory: str):
+    level_file = os.path.join(directory, f'{level.rows}.lvl')
+    write_level(level_file, level)
+    return lambda: load_level(level_file)
+
+def _load_plv(level: Grid, centre: list, directory: str):
+    level_file = os.path.join(directory, f'{level.rows}.plv')
+    write_level(level_file, level)
+    return lambda: load_level(level_file)
+
+def _start_messages(level: Grid, centre: list, directory: str):
+    return lambda: start_episode('benchmark', level, centre, centre, user_prompt)
+
+def _step_messages(level: Grid, centre: list, directory: str):
+    from google.genai import types
+
+    state = start_episode('benchmark', level, centre, centre, user_prompt)
+    calls = [types.FunctionCall(name='move_east'), types.FunctionCall(name='move_west')]
+
+    def step():
+        for function_call in calls:
+            types.Content(role="user", parts=call_function(function_call, state))
+    return step
+
+# name of every benchmark and the function preparing it, returning the operation to time
+BENCHMARKS = {
+    'create_drone_map': _create_drone_map,
+    'update_map': _update_map,
+    'check_walkable': _check_walkable,
+    'move': _move,
+    'show_level': _show_level,
+    'load_lvl': _load_lvl,
+    'load_plv': _load_plv,
+    'start_messages': _start_messages,
+    'step_messages': _step_messages,
+}
+
+# modules that have to import without the Gemini SDK and dotenv, timed in fresh interpreters
+IMPORT_MODULES = ('functions.call_function', 'episode', 'renderer', 'oracle', 'sampler', 'backends', 'main', 'runner')
+# modules only a live backend may import
+SDK_MODULES = ('google.genai', 'dotenv')
+
+STARTUP_SCRIPT = """
+import sys, time, tracemalloc
+if {traced}:
+    tracemalloc.start()
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1] if {traced} else 0
+print(elapsed, peak, ','.join(name for name in {sdk!r} if name in sys.modules))
+"""
+
+# an episode of runner.py with the scripted frontier backend, a scripted run must not load the SDK either
+SCRIPTED_EPISODE = {"level": "Level_2.lvl", "start": [2, 2], "target": [6, 6]}
+SCRIPTED_RUN = """
+import io, contextlib
+import runner
+sys.argv = ['runner.py', {manifest!r}, '--backend', 'frontier']
+with contextlib.redirect_stdout(io.StringIO()):
+    runner.main()
+"""
+
+def measure_startup(statement: str, runs: int = 5) -> dict:
+    """
+    Times python code in fresh interpreters started in the directory of the repository.
+
+    Parameters
+    ----------
+    statement : str
+        The code, e.g. an import.
+    runs : int, optional
+        Number of timed runs, the fastest counts.
+
+    Returns
+    -------
+    dict
+        'ops_per_sec': runs per second,
+        'peak_bytes': peak memory allocated by the code,
+        'sdk_modules': modules of SDK_MODULES loaded by the code.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run(traced: bool) -> list[str]:
+        script = STARTUP_SCRIPT.format(statement=statement, traced=traced, sdk=SDK_MODULES)
+        output = subprocess.run([sys.executable, '-c', script], cwd=directory, capture_output=True, text=True, check=True).stdout
+        return output.split(' ')
+
+    times = [float(run(False)[0]) for _ in range(runs)]
+    _, peak, loaded = run(True)
+    return {
+        'ops_per_sec': 1 / min(times),
+        'peak_bytes': int(peak),
+        'sdk_modules': [name for name in loaded.strip().split(',') if name],
+    }
+
+def measure_import(module: str, runs: int = 5) -> dict:
+    """
+    Times the import of a module in fresh interpreters, see measure_startup.
+    """
+    return measure_startup(f'import {module}', runs)
+
+def measure_scripted_run(runs: int = 5) -> dict:
+    """
+    Times runner.py with the scripted frontier backend on SCRIPTED_EPISODE in fresh interpreters, see measure_startup.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        manifest = os.path.join(directory, 'manifest.jsonl')
+        with open(manifest, 'w') as f:
+            f.write(json.dumps(SCRIPTED_EPISODE) + '\n')
+        return measure_startup(SCRIPTED_RUN.format(manifest=manifest), runs)
+
+def run_import_benchmarks(modules=IMPORT_MODULES, runs: int = 5) -> dict:
+    """
+    Times the imports of the modules and a scripted run.
+
+    Returns
+    -------
+    dict
+        Results keyed by 'import/module' and 'run/scripted'.
+    """
+    results = {}
+    for module in modules:
+        results[f'import/{module}'] = measure_import(module, runs)
+        print(f"import/{module}: {1000 / results[f'import/{module}']['ops_per_sec']:.1f} ms", file=sys.stderr)
+    results['run/scripted'] = measure_scripted_run(runs)
+    print(f"run/scripted: {1000 / results['run/scripted']['ops_per_sec']:.1f} ms", file=sys.stderr)
+    return results
+
+def measure(operation, min_time: float = 0.2) -> dict:
+    """
+    Times an operation and measures the peak memory of one run of it.
+
+    Parameters
+    ----------
+    operation : callable
+        Operation without arguments.
+    min_time : float, optional
+        Seconds the operation is repeated for, at least once.
+
+    Returns
+    -------
+    dict
+        'ops_per_sec': runs per second,
+        'peak_bytes': peak memory allocated by one run.
+    """
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    runs = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while runs == 0 or elapsed < min_time:
+        operation()
+        runs += 1
+        elapsed = time.perf_counter() - start
+    return {'ops_per_sec': runs / elapsed, 'peak_bytes': peak}
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, min_time: float = 0.2) -> dict:
+    """
+    Runs the benchmarks for all map sizes.
+
+    Parameters
+    ----------
+    sizes : list[int], optional
+        Rows and columns of the square levels.
+    names : list[str], optional
+        Benchmarks to run, all if not given.
+    min_time : float, optional
+        Seconds every benchmark is repeated for.
+
+    Returns
+    -------
+    dict
+        Results keyed by 'name/size'.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            level, centre = benchmark_level(size)
+            for name in names or BENCHMARKS:
+                operation = BENCHMARKS[name](level, centre, directory)
+                results[f'{name}/{size}'] = measure(operation, min_time)
+                print(f"{name}/{size}: {results[f'{name}/{size}']['ops_per_sec']:.1f} ops/s", file=sys.stderr)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Finds the benchmarks slower than the baseline by more than the threshold.
+
+    Returns
+    -------
+    list[str]
+        Keys of the regressed benchmarks.
+    """
+    return [
+        key for key, result in results.items()
+        if key in baseline and result['ops_per_sec'] < baseline[key]['ops_per_sec'] * (1 - threshold)
+    ]
+
+def format_results(results: dict, baseline: dict) -> str:
+    """
+    Formats the results as a table, with the change against the baseline.
+    """
+    lines = [f"{'benchmark':<24}{'ops/s':>14}{'peak memory':>16}{'change':>10}"]
+    for key, result in results.items():
+        change = ''
+        if key in baseline:
+            change = f"{result['ops_per_sec'] / baseline[key]['ops_per_sec'] - 1:+.1%}"
+        lines.append(f"{key:<24}{result['ops_per_sec']:>14.1f}{result['peak_bytes'] / 1024:>13.1f} KiB{change:>10}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the simulator functions across map sizes.")
+    parser.add_argument("--sizes", default=','.join(str(size) for size in DEFAULT_SIZES), help="comma separated sizes of the square levels")
+    parser.add_argument("--only", help="comma separated benchmarks to run: " + ', '.join(BENCHMARKS) + ', imports')
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds every benchmark is repeated for")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="JSON file with the baseline results")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown against the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else None
+    if names and any(name not in BENCHMARKS and name != 'imports' for name in names):
+        parser.error(f"unknown benchmark, choose from {', '.join(BENCHMARKS)}, imports")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    results = {}
+    benchmarks = [name for name in names if name != 'imports'] if names else None
+    if benchmarks != []:
+        results.update(run_benchmarks(sizes, benchmarks, args.min_time))
+    if names is None or 'imports' in names:
+        results.update(run_import_benchmarks())
+    print(format_results(results, baseline))
+
+    # the simulator has to import and run with a scripted backend without the SDK, independent of the baseline
+    sdk_imports = [f"{key} ({', '.join(result['sdk_modules'])})" for key, result in results.items() if result.get('sdk_modules')]
+    if sdk_imports:
+        print(f"Imports and runs loading the Gemini SDK or dotenv: {', '.join(sdk_imports)}")
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+        if sdk_imports:
+            sys.exit(1)
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+    if regressions or sdk_imports:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
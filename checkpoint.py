@@ -0,0 +1,125 @@
+import os
+import gzip
+import json
+
+from episode import EpisodeState, load_level
+from functions.grid import Grid
+from oracle import file_hash
+from plain_types import sdk_types
+from response_cache import to_json_data
+
+CHECKPOINT_VERSION = 1
+
+def save_checkpoint(checkpoint_file: str, state: EpisodeState):
+    """
+    Writes the state of an episode to a gzip compressed JSON file.
+
+    The file is replaced atomically, an interrupted write leaves the previous checkpoint intact.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path of the checkpoint.
+    state : EpisodeState
+        State of the episode.
+    """
+    data = {
+        'version': CHECKPOINT_VERSION,
+        'level_file': state.level_file,
+        'level_hash': file_hash(state.level_file),
+        'drone_position': state.drone_position,
+        'target_position': state.target_position,
+        'rows': state.drone_map.rows,
+        'columns': state.drone_map.columns,
+        # the known map only contains ' ', 'X' and '?'
+        'drone_map': bytes(state.drone_map.cells).decode('ascii'),
+        'steps': state.steps,
+        'moves': state.moves,
+        'finished': state.finished,
+        'final_text': state.final_text,
+        'messages': to_json_data(state.messages),
+    }
+    temporary = f'{checkpoint_file}.{os.getpid()}.tmp'
+    with gzip.open(temporary, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temporary, checkpoint_file)
+
+def load_checkpoint(checkpoint_file: str, backend=None) -> EpisodeState:
+    """
+    Restores the state of an episode from a checkpoint.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path of the checkpoint.
+    backend : Backend, optional
+        Backend the episode is continued with, its message_types build the messages. The
+        classes of the Gemini SDK are used without it.
+
+    Returns
+    -------
+    EpisodeState
+        State of the episode when the checkpoint was written.
+
+    Raises
+    ------
+    ValueError
+        If the checkpoint is corrupt or the level file changed since it was written.
+    """
+    try:
+        with gzip.open(checkpoint_file, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        raise ValueError("Checkpoint file corrupt")
+    if data.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("Checkpoint file corrupt")
+    if file_hash(data['level_file']) != data['level_hash']:
+        raise ValueError("Level file changed since the checkpoint was written")
+
+    types = backend.message_types if backend is not None else sdk_types()
+
+    return EpisodeState(
+        level_file=data['level_file'],
+        level=load_level(data['level_file']),
+        drone_position=data['drone_position'],
+        target_position=data['target_position'],
+        drone_map=Grid(data['rows'], data['columns'], cells=bytearray(data['drone_map'].encode('ascii'))),
+        messages=[types.Content.model_validate(message) for message in data['messages']],
+        moves=data['moves'],
+        steps=data['steps'],
+        finished=data['finished'],
+        final_text=data['final_text'],
+        message_types=types,
+    )
+
+class Checkpointer:
+    """
+    Writes a checkpoint of an episode every few steps.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Path of the checkpoint.
+    every : int, optional
+        Number of steps between two checkpoints.
+    """
+
+    def __init__(self, checkpoint_file: str, every: int = 10):
+        self.checkpoint_file = checkpoint_file
+        self.every = every
+        self._saved = None
+
+    def update(self, state: EpisodeState):
+        """
+        Writes a checkpoint if it is due after the last step.
+        """
+        if self.every > 0 and state.steps % self.every == 0:
+            self.save(state)
+
+    def save(self, state: EpisodeState):
+        """
+        Writes a checkpoint, unless the last one already contains the current step.
+        """
+        if self._saved != state.steps:
+            save_checkpoint(self.checkpoint_file, state)
+            self._saved = state.steps
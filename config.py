@@ -1,5 +1,23 @@
 model_name = "gemini-2.5-flash"
 
+# After a move, send the whole known map instead of only the newly revealed cells
+full_map_after_move = False
+
+# Number of cells the drone sees in every direction (1 is the 3x3 area around it)
+# and whether walls block its view
+sensor_radius = 1
+sensor_occlusion = False
+
+# Text of the known map: 'list' sends the rows as lists of cells, 'rows' sends one line
+# per row with its row number, cropped to the cells that matter
+map_encoding = 'list'
+# For 'rows': crop to the bounding box of the known cells, and to at most map_window
+# rows and columns in every direction around the drone (None shows all of them)
+map_crop_known = True
+map_window = None
+# For 'rows': write runs of at least this many '?' or 'X' as e.g. '?*12' (0 writes every cell)
+map_run_length = 6
+
 user_prompt_0 = """
 You are operating a drone. Move the drone from the drone location to the target location.
 """
@@ -51,4 +69,9 @@ You can perform the following actions:
 - move_east (you move east/right on the grid and automatically updates your map and checks where you can walk next)
 - move_north (you move north/up on the grid and automatically updates your map and checks where you can walk next)
 - move_south (you move south/down on the grid and automatically updates your map and checks where you can walk next)
+- move_sequence (you move in the given list of directions one after another, stopping at the first move that is not possible)
+- navigate_to (you move along the shortest path through spaces known to be free to the given row and column, updating your map on the way)
+
+After a move you are told which cells were newly revealed, as [row, column, content].
+Use check_map to review the whole map known to you.
 """
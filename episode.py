@@ -0,0 +1,438 @@
+import time
+from dataclasses import dataclass, field
+
+from functions.allowed_functions import check_positions, check_map, update_map
+from functions.call_function import call_function, function_descriptions, moving_functions
+from functions.grid import Grid
+from level_io import load_level
+from plain_types import sdk_types
+from renderer import Renderer
+from tracing import timed
+
+@dataclass
+class EpisodeState:
+    """
+    Everything that changes while the drone searches for the target.
+    """
+    level_file: str
+    level: Grid
+    drone_position: list
+    target_position: list
+    drone_map: Grid
+    messages: list = field(default_factory=list)
+    moves: int = 0
+    steps: int = 0
+    finished: bool = False
+    final_text: str | None = None
+    # time.monotonic() by which the episode has to be finished, None for no limit
+    deadline: float | None = None
+    # module the messages are built with, the message_types of the backend
+    message_types: object = field(default=None, repr=False)
+
+    @property
+    def reached_target(self) -> bool:
+        return self.drone_position == self.target_position
+
+def create_drone_map(level: Grid, drone: list) -> Grid:
+    """
+    Generates a map for the drone_view.
+
+    Parameters
+    ----------
+    level: Grid
+        level.
+    drone : list
+        Coordinates of the drone.
+
+    Returns
+    -------
+    Grid
+        The known map for the drone, all '?', except the location of the drone itself
+    """
+    x_drone, y_drone = drone
+
+    drone_map = Grid(level.rows, level.columns, fill='?')
+    drone_map.set(x_drone, y_drone, level.get(x_drone, y_drone))
+
+    return drone_map
+
+def validate_positions(level: Grid, drone: list, target: list):
+    """
+    Checks that drone and target are placed in open space of the level.
+
+    Raises
+    ------
+    ValueError
+        If one of the positions is outside the level or not in open space.
+    """
+    if not level.inside(*drone) or level.get(*drone) != ' ':
+        raise ValueError("Drone not in open space.")
+    if not level.inside(*target) or level.get(*target) != ' ':
+        raise ValueError("Target not in open space.")
+
+def start_episode(level_file: str, level: Grid, drone: list, target: list, prompt: str, backend=None) -> EpisodeState:
+    """
+    Creates the drone map and the starting messages of an episode.
+
+    Parameters
+    ----------
+    level_file : str
+        Name of the level file, kept for reference.
+    level : Grid
+        The level.
+    drone : list
+        Starting coordinates of the drone.
+    target : list
+        Coordinates of the target.
+    prompt : str
+        User prompt given to the model.
+    backend : Backend, optional
+        Backend the episode is run with, its message_types build the messages. The
+        classes of the Gemini SDK are used without it.
+
+    Returns
+    -------
+    EpisodeState
+        State of the new episode.
+    """
+    types = backend.message_types if backend is not None else sdk_types()
+
+    drone_position, target_position = list(drone), list(target)
+
+    drone_map = create_drone_map(level, drone_position)
+    drone_map = update_map(level, drone_map, drone_position)
+
+    # Compile user prompt as message, as well as the starting locations and the starting map known to the drone
+    messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    messages.append(types.Content(role="user", parts=[types.Part(text=check_positions(drone_position, target_position))]))
+    messages.append(types.Content(role="user", parts=[types.Part(text=check_map(drone_map, drone_position))]))
+
+    return EpisodeState(
+        level_file=level_file,
+        level=level,
+        drone_position=drone_position,
+        target_position=target_position,
+        drone_map=drone_map,
+        messages=messages,
+        message_types=types,
+    )
+
+def check_backend(backend, state: EpisodeState):
+    """
+    Makes sure the messages of an episode were built with the message types of the backend.
+
+    Raises
+    ------
+    ValueError
+        If the episode was started for a backend with other message types, e.g. a
+        scripted one, since the Gemini backend only sends messages of the Gemini SDK.
+    """
+    if backend.message_types is not state.message_types:
+        raise ValueError("The episode was started for another backend, pass the backend to start_episode")
+
+def request_messages(state: EpisodeState, history=None) -> list:
+    """
+    Selects the messages of the episode that are sent with the next request.
+
+    Parameters
+    ----------
+    state : EpisodeState
+        State of the episode.
+    history : HistoryManager, optional
+        Keeps the messages within a budget, all messages are sent without it.
+
+    Returns
+    -------
+    list
+        Messages for the next request.
+    """
+    if history is None:
+        return state.messages
+    return history.compact(state.messages, state)
+
+def handle_response(state: EpisodeState, response, verbose: bool = False, tracer=None, renderer: Renderer | None = None) -> bool:
+    """
+    Adds a model response to the episode and executes the function calls in it.
+
+    Parameters
+    ----------
+    state : EpisodeState
+        State of the episode, updated in place.
+    response : types.GenerateContentResponse
+        Response of the model.
+    verbose : boolean, optional
+        whether every step should be printed, in full if no renderer is given
+    tracer : Tracer, optional
+        records timings and token counts of the step
+    renderer : Renderer, optional
+        shows the steps and the map known to the drone
+
+    Returns
+    -------
+    bool
+        True if the model gave a final response without function calls.
+    """
+    types = state.message_types
+
+    counter = state.steps
+    state.steps += 1
+
+    # take the candidates from the response and append them to the current list of messages
+    candidates = response.candidates
+    if candidates:
+        for candidate in candidates:
+            state.messages.append(candidate.content)
+
+    # check whether there was any meta data found with the response
+    if response.usage_metadata == None:
+        raise RuntimeError("No Meta-data found!")
+
+    # get the list of function calls from the response
+    function_call_list = response.function_calls
+    if not function_call_list:
+        state.finished = True
+        state.final_text = response.text
+        if tracer is not None:
+            tracer.record(state, response, [], 0)
+        return True
+
+    if verbose and renderer is None:
+        renderer = Renderer()
+
+    moves = state.moves
+    function_responses = []
+    for function_call in function_call_list:
+        function_responses.extend(execute_call(state, function_call, counter, tracer=tracer, renderer=renderer))
+
+    # add the function responses to the messages list
+    state.messages.append(types.Content(role="user", parts=function_responses))
+    if tracer is not None:
+        tracer.record(state, response, [function_call.name for function_call in function_call_list], state.moves - moves)
+    return False
+
+def execute_call(state: EpisodeState, function_call, counter: int, tracer=None, renderer: Renderer | None = None) -> list:
+    """
+    Executes one function call of a response and shows it.
+
+    Parameters
+    ----------
+    state : EpisodeState
+        State of the episode, updated in place.
+    function_call : types.FunctionCall
+        The function call.
+    counter : int
+        Number of the step, shown by the renderer.
+    tracer : Tracer, optional
+        records timings of the step
+    renderer : Renderer, optional
+        shows the steps and the map known to the drone
+
+    Returns
+    -------
+    list
+        Function response parts.
+    """
+    with timed(tracer, 'tools'):
+        function_responses = call_function(function_call, state)
+
+    if renderer is not None:
+        with timed(tracer, 'render'):
+            if function_call.name in function_descriptions:
+                renderer.message(f'Step {counter}: {function_descriptions[function_call.name]}')
+            else:
+                renderer.message(f'Step {counter}: Tried to use function {function_call.name}. It does not exist:')
+            if function_call.name in moving_functions:
+                renderer.render(state)
+    return function_responses
+
+class StreamHandler:
+    """
+    Executes the function calls of a streamed response as soon as their parts arrive.
+
+    Text in the chunks is shown by the renderer as it arrives. After the last chunk,
+    finish adds the whole response and the function responses to the episode, as
+    handle_response does for a complete response.
+
+    Parameters
+    ----------
+    state : EpisodeState
+        State of the episode, updated in place.
+    verbose : boolean, optional
+        whether every step should be printed, in full if no renderer is given
+    tracer : Tracer, optional
+        records timings and token counts of the step
+    renderer : Renderer, optional
+        shows the steps, the text and the map known to the drone
+    """
+
+    def __init__(self, state: EpisodeState, verbose: bool = False, tracer=None, renderer: Renderer | None = None):
+        self.state = state
+        self.tracer = tracer
+        self.renderer = Renderer() if verbose and renderer is None else renderer
+        self.counter = state.steps
+        self.moves = state.moves
+        self.chunks = []
+        self.function_calls = []
+        self.function_responses = []
+        self.start = time.perf_counter()
+        self._line_open = False
+
+    def feed(self, chunk):
+        """
+        Takes the next chunk of the response, executing its function calls and showing its text.
+        """
+        self.chunks.append(chunk)
+        if not chunk.candidates or chunk.candidates[0].content is None:
+            return
+        for part in chunk.candidates[0].content.parts or []:
+            if part.function_call is not None:
+                if not self.function_calls and self.tracer is not None:
+                    self.tracer.first_action(time.perf_counter() - self.start)
+                self._end_line()
+                self.function_calls.append(part.function_call)
+                self.function_responses.extend(execute_call(self.state, part.function_call, self.counter, tracer=self.tracer, renderer=self.renderer))
+            elif part.text and not part.thought and self.renderer is not None:
+                self.renderer.partial(part.text)
+                self._line_open = True
+
+    def _end_line(self):
+        # text shown so far is followed by a new line before anything else is shown
+        if self._line_open:
+            self.renderer.partial('\n')
+            self._line_open = False
+
+    def finish(self) -> bool:
+        """
+        Adds the response and the function responses to the episode.
+
+        Returns
+        -------
+        bool
+            True if the model gave a final response without function calls.
+        """
+        types = self.state.message_types
+        from backends import merge_chunks
+
+        state = self.state
+        state.steps += 1
+        self._end_line()
+
+        response = merge_chunks(self.chunks, types)
+        for candidate in response.candidates or []:
+            state.messages.append(candidate.content)
+
+        if response.usage_metadata == None:
+            raise RuntimeError("No Meta-data found!")
+
+        if not self.function_calls:
+            state.finished = True
+            state.final_text = response.text
+            if self.tracer is not None:
+                self.tracer.record(state, response, [], 0)
+            return True
+
+        state.messages.append(types.Content(role="user", parts=self.function_responses))
+        if self.tracer is not None:
+            self.tracer.record(state, response, [function_call.name for function_call in self.function_calls], state.moves - self.moves)
+        return False
+
+def generate_response(backend, messages: list, state=None):
+    """
+    Generates response from the backend with current set of messages.
+
+    Parameters
+    ----------
+    backend : Backend
+        Backend used, e.g. Gemini or a scripted stand-in.
+    message : list
+        list of messages used
+    state : EpisodeState, optional
+        state of the episode, needed by the scripted backends
+
+    Returns
+    -------
+    response
+        response from the model.
+    """
+    return backend.generate(messages, state)
+
+def step(backend, state: EpisodeState, history=None, tracer=None, verbose: bool = False, renderer: Renderer | None = None) -> bool:
+    """
+    Requests the next response from the backend and executes it.
+
+    Parameters
+    ----------
+    backend : Backend
+        Backend the response is requested from.
+    state : EpisodeState
+        State of the episode, updated in place.
+    history : HistoryManager, optional
+        Keeps the messages sent within a budget.
+    tracer : Tracer, optional
+        records timings and token counts of the step
+    verbose : boolean, optional
+        whether every step should be printed
+    renderer : Renderer, optional
+        shows the steps and the map known to the drone
+
+    Returns
+    -------
+    bool
+        True if the model gave a final response without function calls.
+    """
+    check_backend(backend, state)
+    messages = request_messages(state, history)
+    with timed(tracer, 'model'):
+        response = generate_response(backend, messages, state)
+    if tracer is not None:
+        tracer.request(messages)
+    return handle_response(state, response, verbose=verbose, tracer=tracer, renderer=renderer)
+
+def stream_step(backend, state: EpisodeState, history=None, tracer=None, verbose: bool = False, renderer: Renderer | None = None) -> bool:
+    """
+    Same as step, with the response streamed: function calls are executed as soon as they
+    arrive instead of after the whole response.
+    """
+    check_backend(backend, state)
+    messages = request_messages(state, history)
+    handler = StreamHandler(state, verbose=verbose, tracer=tracer, renderer=renderer)
+    chunks = backend.stream(messages, state)
+    while True:
+        with timed(tracer, 'model'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        handler.feed(chunk)
+    if tracer is not None:
+        tracer.request(messages)
+    return handler.finish()
+
+async def astream_step(backend, state: EpisodeState, history=None, tracer=None, verbose: bool = False, renderer: Renderer | None = None) -> bool:
+    """
+    Same as stream_step, for use in an event loop.
+    """
+    check_backend(backend, state)
+    messages = request_messages(state, history)
+    handler = StreamHandler(state, verbose=verbose, tracer=tracer, renderer=renderer)
+    chunks = backend.astream(messages, state)
+    while True:
+        with timed(tracer, 'model'):
+            chunk = await anext(chunks, None)
+        if chunk is None:
+            break
+        handler.feed(chunk)
+    if tracer is not None:
+        tracer.request(messages)
+    return handler.finish()
+
+async def astep(backend, state: EpisodeState, history=None, tracer=None, verbose: bool = False, renderer: Renderer | None = None) -> bool:
+    """
+    Same as step, for use in an event loop.
+    """
+    check_backend(backend, state)
+    messages = request_messages(state, history)
+    with timed(tracer, 'model'):
+        response = await backend.agenerate(messages, state)
+    if tracer is not None:
+        tracer.request(messages)
+    return handle_response(state, response, verbose=verbose, tracer=tracer, renderer=renderer)
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import model_name
+from backends import create_client, create_backend
+from level_catalog import LevelCatalog
+from oracle import DistanceCache
+from prompt_cache import create_prompt_cache
+from response_cache import ResponseCache
+from scheduler import RequestScheduler
+from runner import EpisodeSpec, resolve_prompt, load_manifest, run_episodes
+from sampler import sample_pairs
+
+def load_experiment(experiment_file: str) -> dict:
+    """
+    Reads an experiment definition.
+
+    The definition is a JSON object like
+    {
+        "prompts": ["user_prompt_0", "user_prompt_3"],
+        "models": ["gemini-2.5-flash"],
+        "manifests": ["eval.jsonl"],
+        "levels": ["Level_1.lvl", "Level_3.lvl"],
+        "pairs": 20,
+        "repetitions": 3
+    }
+    Every episode of the manifests and "pairs" sampled start and target pairs of every
+    level are run with every prompt and model, "repetitions" times each. Further optional
+    keys: "backend", "seed", "max_steps", "concurrency", "deadline", "rpm", "tpm",
+    "cache" (a response cache mode) and "prompt_cache" (a prompt cache mode).
+
+    Parameters
+    ----------
+    experiment_file : str
+        Path of the definition.
+
+    Returns
+    -------
+    dict
+        The definition with defaults filled in.
+    """
+    with open(experiment_file, "r") as f:
+        experiment = json.load(f)
+    experiment.setdefault('name', os.path.splitext(os.path.basename(experiment_file))[0])
+    experiment.setdefault('prompts', ['user_prompt'])
+    experiment.setdefault('models', [model_name])
+    experiment.setdefault('manifests', [])
+    experiment.setdefault('levels', [])
+    experiment.setdefault('pairs', 10)
+    experiment.setdefault('repetitions', 1)
+    experiment.setdefault('backend', 'gemini')
+    experiment.setdefault('seed', 0)
+    experiment.setdefault('max_steps', 1000)
+    experiment.setdefault('concurrency', 8)
+    return experiment
+
+def expand_experiment(experiment: dict) -> list[dict]:
+    """
+    Lists all episodes of an experiment.
+
+    Returns
+    -------
+    list[dict]
+        One entry per episode with the keys level, start, target (0-based), prompt, model and repetition.
+    """
+    pairs = []
+    for manifest in experiment['manifests']:
+        pairs.extend((spec.level_file, spec.start, spec.target) for spec in load_manifest(manifest))
+    for n, level_file in enumerate(experiment['levels']):
+        for entry in sample_pairs(level_file, experiment['pairs'], seed=experiment['seed'] + n):
+            pairs.append((level_file, [entry['start'][0]-1, entry['start'][1]-1], [entry['target'][0]-1, entry['target'][1]-1]))
+
+    return [
+        {'level': level_file, 'start': start, 'target': target, 'prompt': prompt, 'model': model, 'repetition': repetition}
+        for repetition in range(experiment['repetitions'])
+        for model in experiment['models']
+        for prompt in experiment['prompts']
+        for level_file, start, target in pairs
+    ]
+
+# client and prompt cache of every model in a worker process, shared by all of its chunks
+_clients = {}
+
+def create_shared_prompt_caches(experiment: dict) -> dict:
+    """
+    Creates the caches of all prompts on the Gemini API once per model, for all chunks of the run.
+
+    The workers reference the caches by name, only the process running the experiment
+    deletes them at the end. Local prompt caches are kept in the memory of every worker
+    process instead, see run_chunk.
+
+    Returns
+    -------
+    dict
+        PromptCache of every model, empty without a 'gemini' prompt cache.
+    """
+    if experiment.get('prompt_cache') != 'gemini':
+        return {}
+    client = create_client(experiment['backend'], experiment.get('cache'))
+    prompt_caches = {}
+    for model in experiment['models']:
+        _, prompt_cache = create_prompt_cache(client, 'gemini', model=model)
+        if prompt_cache is None:
+            continue
+        for prompt in experiment['prompts']:
+            prompt_cache.name(resolve_prompt(prompt)[1])
+        prompt_caches[model] = prompt_cache
+    return prompt_caches
+
+def run_chunk(experiment: dict, episodes: list[dict], workers: int, prompt_handles: dict | None = None) -> list[dict]:
+    """
+    Runs episodes of one model and repetition in a worker process.
+
+    The rate limits of the experiment are split evenly between the workers. The client
+    and prompt cache of a model are created by the first chunk of the model in a worker
+    and reused by the following ones. prompt_handles are the handles of the caches
+    created by create_shared_prompt_caches.
+    """
+    model, repetition = episodes[0]['model'], episodes[0]['repetition']
+    if model not in _clients:
+        client = create_client(experiment['backend'], experiment.get('cache'))
+        client, prompt_cache = create_prompt_cache(client, experiment.get('prompt_cache'), model=model)
+        if prompt_cache is not None and prompt_handles is not None:
+            prompt_cache.handles.update(prompt_handles)
+        _clients[model] = (client, prompt_cache)
+    client, prompt_cache = _clients[model]
+    cache = ResponseCache(mode=experiment['cache']) if experiment.get('cache') else None
+    scheduler = RequestScheduler(
+        requests_per_minute=experiment['rpm'] / workers if experiment.get('rpm') else None,
+        tokens_per_minute=experiment['tpm'] / workers if experiment.get('tpm') else None,
+    )
+    backend = create_backend(experiment['backend'], client=client, cache=cache, seed=experiment['seed'] + repetition, scheduler=scheduler, model=model, prompt_cache=prompt_cache)
+
+    specs = []
+    for episode in episodes:
+        prompt_name, prompt = resolve_prompt(episode['prompt'])
+        specs.append(EpisodeSpec(episode['level'], episode['start'], episode['target'], prompt, prompt_name))
+    results = asyncio.run(run_episodes(
+        backend, specs,
+        concurrency=experiment['concurrency'],
+        max_steps=experiment['max_steps'],
+        oracle=DistanceCache(),
+        catalog=LevelCatalog(),
+        deadline=experiment.get('deadline'),
+    ))
+    for result in results:
+        result['model'] = model
+        result['repetition'] = repetition
+    return results
+
+def summarize(results: list[dict]) -> list[dict]:
+    """
+    Aggregates the results per prompt and model.
+
+    Returns
+    -------
+    list[dict]
+        One row per prompt and model with the number of episodes and errors, the success
+        rate and the means of steps, moves, tokens, wall time and path efficiency.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result['prompt'], result['model']), []).append(result)
+
+    rows = []
+    for (prompt, model), group in sorted(groups.items()):
+        finished = [result for result in group if not result['error']]
+        count = len(finished) or 1
+        rows.append({
+            'prompt': prompt,
+            'model': model,
+            'episodes': len(group),
+            'errors': len(group) - len(finished),
+            'success': sum(result['success'] for result in finished) / count,
+            'steps': sum(result['steps'] for result in finished) / count,
+            'moves': sum(result['moves'] for result in finished) / count,
+            'tokens': sum(result['trace']['total_tokens'] for result in finished) / count,
+            'wall_time': sum(result['wall_time'] for result in finished) / count,
+            'efficiency': sum(result['score']['efficiency'] for result in finished if 'score' in result) / count,
+        })
+    return rows
+
+def format_table(rows: list[dict]) -> str:
+    """
+    Formats the aggregated results as a markdown table.
+    """
+    header = ['prompt', 'model', 'episodes', 'errors', 'success', 'steps', 'moves', 'tokens', 'wall time (s)', 'efficiency']
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+    for row in rows:
+        lines.append(
+            f"| {row['prompt']} | {row['model']} | {row['episodes']} | {row['errors']} | {row['success']:.1%} | "
+            f"{row['steps']:.1f} | {row['moves']:.1f} | {row['tokens']:.0f} | {row['wall_time']:.2f} | {row['efficiency']:.3f} |"
+        )
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs every prompt and model of an experiment on every episode and compares them.")
+    parser.add_argument("experiment", help="JSON file with the definition of the experiment")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=25, help="episodes per task of a worker")
+    parser.add_argument("--output", help="JSONL file the results of all episodes are written to")
+    parser.add_argument("--table", help="file the comparison table is written to")
+    args = parser.parse_args()
+
+    experiment = load_experiment(args.experiment)
+    episodes = expand_experiment(experiment)
+    if episodes == []:
+        print("No episodes found!")
+        sys.exit(1)
+
+    # a task only contains episodes of one model and repetition, they share a backend
+    groups = {}
+    for episode in episodes:
+        groups.setdefault((episode['model'], episode['repetition']), []).append(episode)
+    chunks = [
+        group[i:i + args.chunk_size]
+        for group in groups.values()
+        for i in range(0, len(group), args.chunk_size)
+    ]
+    workers = max(min(args.workers, len(chunks)), 1)
+    print(f"{experiment['name']}: {len(episodes)} episodes in {len(chunks)} tasks on {workers} processes")
+
+    results = []
+    output = open(args.output, "w") if args.output else None
+    prompt_caches = create_shared_prompt_caches(experiment)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(run_chunk, experiment, chunk, workers, prompt_caches[chunk[0]['model']].handles if chunk[0]['model'] in prompt_caches else None)
+                for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                chunk_results = future.result()
+                results.extend(chunk_results)
+                if output is not None:
+                    for result in chunk_results:
+                        output.write(json.dumps(result) + '\n')
+                    output.flush()
+                print(f'{len(results)} of {len(episodes)} episodes done')
+    finally:
+        for prompt_cache in prompt_caches.values():
+            prompt_cache.close()
+        if output is not None:
+            output.close()
+
+    table = format_table(summarize(results))
+    print(table)
+    if args.table:
+        with open(args.table, "w") as f:
+            f.write(table + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,16 @@
-from google.genai import types
+from config import sensor_radius, sensor_occlusion, map_encoding, map_crop_known, map_window, map_run_length
+from .grid import Grid
+from .map_encoding import encode_rows
+from .pathfinding import a_star
+from .visibility import Visibility
+
+# Offsets of the four directions the drone can move in
+DIRECTIONS = {
+    'north': (-1, 0),
+    'south': (1, 0),
+    'west': (0, -1),
+    'east': (0, 1),
+}
 
 def check_positions(drone: list, target: list) -> str:
     """
@@ -20,46 +32,70 @@ def check_positions(drone: list, target: list) -> str:
     return f"Your drone is at position {drone}. The target is at position {target}."
 
 # Instruct the API what check_position does 
-schema_check_positions = types.FunctionDeclaration(
-    name="check_positions",
-    description="Returns the coordinates of the drone and the target",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def check_map(drone_map: list[list]) -> str:
+def _schema_check_positions(types):
+    return types.FunctionDeclaration(
+        name="check_positions",
+        description="Returns the coordinates of the drone and the target",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def map_text(drone_map: Grid, drone_position: list | None = None) -> str:
+    """
+    Text of the known map in the encoding chosen in config.py.
+
+    Parameters
+    ----------
+    drone_map : Grid
+        Currently known map for the drone.
+    drone_position : list, optional
+        Coordinates of the drone, needed for map_window.
+
+    Returns
+    -------
+    str
+        The map as lists of cells, or as numbered rows.
+    """
+    if map_encoding == 'rows':
+        return '\n' + encode_rows(drone_map, drone_position, map_crop_known, map_window, map_run_length)
+    return repr(drone_map)
+
+def check_map(drone_map: Grid, drone_position: list | None = None) -> str:
     """
     Checks known map for the drone.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
+    drone_position : list, optional
+        Coordinates of the drone, needed for map_window.
 
     Returns
     -------
     str
         Text giving the drone map.
     """
-    return f'The map known to you is {drone_map}'
+    return f'The map known to you is {map_text(drone_map, drone_position)}'
 
 # Instruct the API what check_map does 
-schema_check_map = types.FunctionDeclaration(
-    name="check_map",
-    description="You review the map known to you.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def check_walkable(drone_map: list[list], drone_position: list) -> str:
+def _schema_check_map(types):
+    return types.FunctionDeclaration(
+        name="check_map",
+        description="You review the map known to you.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def check_walkable(drone_map: Grid, drone_position: list) -> str:
     """
     Checks in which directions the drone can walk.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
@@ -70,41 +106,65 @@ def check_walkable(drone_map: list[list], drone_position: list) -> str:
         Text giving a list of the walkable directions.
     """
 
-    x_max = len(drone_map)
-    y_max = len(drone_map[0])
+    x_drone, y_drone = drone_position
 
     walkable_directions = []
-
-    if 0 <= drone_position[0]-1:
-        if drone_map[drone_position[0]-1][drone_position[1]] == ' ':
-            walkable_directions.append('north')
-    if drone_position[0]+1 < x_max:
-        if drone_map[drone_position[0]+1][drone_position[1]] == ' ':
-            walkable_directions.append('south')
-    if 0 <= drone_position[1]-1:
-        if drone_map[drone_position[0]][drone_position[1]-1] == ' ':
-            walkable_directions.append('west')
-    if drone_position[1]+1 < y_max:
-        if drone_map[drone_position[0]][drone_position[1]+1] == ' ':
-            walkable_directions.append('east')
+    for direction, (dx, dy) in DIRECTIONS.items():
+        if drone_map.inside(x_drone + dx, y_drone + dy) and drone_map.get(x_drone + dx, y_drone + dy) == ' ':
+            walkable_directions.append(direction)
     return f'You can move to the following directions {walkable_directions}'
 
 # Instruct the API what check_walkable does 
-schema_check_walkable = types.FunctionDeclaration(
-    name="check_walkable",
-    description="You determine in which directions you can walk from this location.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def move_north(drone_map: list[list], drone_position: list) -> {str, bool}:
+def _schema_check_walkable(types):
+    return types.FunctionDeclaration(
+        name="check_walkable",
+        description="You determine in which directions you can walk from this location.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def _move(drone_map: Grid, drone_position: list, direction: str) -> {str, bool}:
+    """
+    Attempts to move the drone one step in the given direction.
+
+    Parameters
+    ----------
+    drone_map : Grid
+        Currently known map for the drone.
+    drone : list
+        Coordinates of the drone.
+    direction : str
+        One of 'north', 'south', 'west' or 'east'.
+
+    Returns
+    -------
+    {'text', 'success}
+        'text': Explanation what happened
+        'success': Returns whether the movement was successful
+    """
+    dx, dy = DIRECTIONS[direction]
+    x_new, y_new = drone_position[0] + dx, drone_position[1] + dy
+
+    if not drone_map.inside(x_new, y_new):
+        return {'text' : f'That is outside the allowed area', 'success' : False}
+    cell = drone_map.get(x_new, y_new)
+    if cell == ' ':
+        return {'text' : f'The drone moved {direction} by one step. The new drone position is {[x_new, y_new]}', 'success' : True}
+    elif cell == 'X':
+        return {'text' : f'The drone cannot move there, this is a wall', 'success' : False}
+    elif cell == '?':
+        return {'text' : f'You need to know what it there to move into that space', 'success' : False}
+    else:
+        return {'text' : f'Unidentified obstacle, go around', 'success' : False}
+
+def move_north(drone_map: Grid, drone_position: list) -> {str, bool}:
     """
     Attempts to move the drone north.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
@@ -115,33 +175,25 @@ def move_north(drone_map: list[list], drone_position: list) -> {str, bool}:
         'text': Explanation what happened
         'success': Returns whether the movement was successful
     """
-    if 0 <= drone_position[0]-1:
-        if drone_map[drone_position[0]-1][drone_position[1]] == ' ':
-            return {'text' : f'The drone moved north by one step. The new drone position is {[drone_position[0]-1,drone_position[1]]}', 'success' : True}
-        elif drone_map[drone_position[0]-1][drone_position[1]] == 'X':
-            return {'text' : f'The drone cannot move there, this is a wall', 'success' : False}
-        elif drone_map[drone_position[0]-1][drone_position[1]] == '?':
-            return {'text' : f'You need to know what it there to move into that space', 'success' : False}
-        else:
-            return {'text' : f'Unidentified obstacle, go around', 'success' : False}
-    return {'text' : f'That is outside the allowed area', 'success' : False}
+    return _move(drone_map, drone_position, 'north')
 
 # Instruct the API what move_north does
-schema_move_north = types.FunctionDeclaration(
-    name="move_north",
-    description="Try to move north and update your map",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def move_south(drone_map: list[list], drone_position: list) -> {str, bool}:
+def _schema_move_north(types):
+    return types.FunctionDeclaration(
+        name="move_north",
+        description="Try to move north and update your map",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def move_south(drone_map: Grid, drone_position: list) -> {str, bool}:
     """
     Attempts to move the drone south.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
@@ -152,35 +204,25 @@ def move_south(drone_map: list[list], drone_position: list) -> {str, bool}:
         'text': Explanation what happened
         'success': Returns whether the movement was successful
     """
-    x_max = len(drone_map)
-
-    if drone_position[0]+1 < x_max:
-        if drone_map[drone_position[0]+1][drone_position[1]] == ' ':
-            return {'text' : f'The drone moved south by one step. The new drone position is {[drone_position[0]+1,drone_position[1]]}', 'success' : True}
-        elif drone_map[drone_position[0]+1][drone_position[1]] == 'X':
-            return {'text' : f'The drone cannot move there, this is a wall', 'success' : False}
-        elif drone_map[drone_position[0]+1][drone_position[1]] == '?':
-            return {'text' : f'You need to know what it there to move into that space', 'success' : False}
-        else:
-            return {'text' : f'Unidentified obstacle, go around', 'success' : False}
-    return {'text' : f'That is outside the allowed area', 'success' : False}
+    return _move(drone_map, drone_position, 'south')
 
 # Instruct the API what move_south does 
-schema_move_south = types.FunctionDeclaration(
-    name="move_south",
-    description="Try to move south and update your map.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def move_west(drone_map: list[list], drone_position: list) -> {str, bool}:
+def _schema_move_south(types):
+    return types.FunctionDeclaration(
+        name="move_south",
+        description="Try to move south and update your map.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def move_west(drone_map: Grid, drone_position: list) -> {str, bool}:
     """
     Attempts to west the drone north.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
@@ -191,33 +233,25 @@ def move_west(drone_map: list[list], drone_position: list) -> {str, bool}:
         'text': Explanation what happened
         'success': Returns whether the movement was successful
     """
-    if 0 <= drone_position[1]-1:
-        if drone_map[drone_position[0]][drone_position[1]-1] == ' ':
-            return {'text' : f'The drone moved west by one step. The new drone position is {[drone_position[0],drone_position[1]-1]}', 'success' : True}
-        elif drone_map[drone_position[0]][drone_position[1]-1] == 'X':
-            return {'text' : f'The drone cannot move there, this is a wall', 'success' : False}
-        elif drone_map[drone_position[0]][drone_position[1]-1] == '?':
-            return {'text' : f'You need to know what it there to move into that space', 'success' : False}
-        else:
-            return {'text' : f'Unidentified obstacle, go around', 'success' : False}
-    return {'text' : f'That is outside the allowed area', 'success' : False}
+    return _move(drone_map, drone_position, 'west')
 
 # Instruct the API what move_west does 
-schema_move_west = types.FunctionDeclaration(
-    name="move_west",
-    description="Try to move west and update your map",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def move_east(drone_map: list[list], drone_position: list) -> {str, bool}:
+def _schema_move_west(types):
+    return types.FunctionDeclaration(
+        name="move_west",
+        description="Try to move west and update your map",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+def move_east(drone_map: Grid, drone_position: list) -> {str, bool}:
     """
     Attempts to move the drone east.
 
     Parameters
     ----------
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
@@ -228,66 +262,180 @@ def move_east(drone_map: list[list], drone_position: list) -> {str, bool}:
         'text': Explanation what happened
         'success': Returns whether the movement was successful
     """
-    y_max = len(drone_map[0])
-
-    if drone_position[1]+1 < y_max:
-        if drone_map[drone_position[0]][drone_position[1]+1] == ' ':
-            return {'text' : f'The drone moved east by one step. The new drone position is {[drone_position[0],drone_position[1]+1]}', 'success' : True}
-        elif drone_map[drone_position[0]][drone_position[1]+1] == 'X':
-            return {'text' : f'The drone cannot move there, this is a wall', 'success' : False}
-        elif drone_map[drone_position[0]][drone_position[1]+1] == '?':
-            return {'text' : f'You need to know what it there to move into that space', 'success' : False}
-        else:
-            return {'text' : f'Unidentified obstacle, go around', 'success' : False}
-    return {'text' : f'That is outside the allowed area', 'success' : False}
+    return _move(drone_map, drone_position, 'east')
 
 # Instruct the API what move_east does 
-schema_move_east = types.FunctionDeclaration(
-    name="move_east",
-    description="Try to move east and update your map",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-    ),
-)
-
-def update_map(level: list[list], drone_map: list[list], drone_position: list) -> list[list]:
+def _schema_move_east(types):
+    return types.FunctionDeclaration(
+        name="move_east",
+        description="Try to move east and update your map",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+        ),
+    )
+
+# Instruct the API what move_sequence does
+def _schema_move_sequence(types):
+    return types.FunctionDeclaration(
+        name="move_sequence",
+        description="Try to move in the given directions one after another, stopping at the first move that is not possible, and update your map",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "directions": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(
+                        type=types.Type.STRING,
+                        enum=list(DIRECTIONS),
+                    ),
+                    description="Directions of the moves in order, e.g. ['east', 'east', 'south']",
+                ),
+            },
+            required=["directions"],
+        ),
+    )
+
+def plan_navigation(drone_map: Grid, drone_position: list, target: list) -> dict:
+    """
+    Plans a path to a target over the cells known to be free.
+
+    Parameters
+    ----------
+    drone_map : Grid
+        Currently known map for the drone.
+    drone : list
+        Coordinates of the drone.
+    target : list
+        Coordinates the drone should go to.
+
+    Returns
+    -------
+    {'text', 'success', 'directions'}
+        'text': Explanation if no path was found
+        'success': Returns whether a path was found
+        'directions': Directions of the moves along the path
+    """
+    if not drone_map.inside(*target):
+        return {'text' : f'That is outside the allowed area', 'success' : False, 'directions' : []}
+    cell = drone_map.get(*target)
+    if cell == '?':
+        return {'text' : f'You need to know what is at {target} to navigate there', 'success' : False, 'directions' : []}
+    if cell != ' ':
+        return {'text' : f'The position {target} is not free', 'success' : False, 'directions' : []}
+    directions = a_star(drone_map, drone_position, target)
+    if directions is None:
+        return {'text' : f'There is no known free path to {target}, explore to reveal more of the map', 'success' : False, 'directions' : []}
+    return {'text' : '', 'success' : True, 'directions' : directions}
+
+# Instruct the API what navigate_to does
+def _schema_navigate_to(types):
+    return types.FunctionDeclaration(
+        name="navigate_to",
+        description="Move along the shortest path through spaces known to be free to the given position and update your map on the way",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "row": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Row of the position to move to, as given by check_positions",
+                ),
+                "column": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Column of the position to move to, as given by check_positions",
+                ),
+            },
+            required=["row", "column"],
+        ),
+    )
+
+# What the drone sees around its position, set in config.py
+visibility = Visibility(sensor_radius, sensor_occlusion)
+
+def reveal_cells(level: Grid, drone_map: Grid, drone_position: list) -> list[list]:
+    """
+    Reveals the cells the drone sees around its position on the drone map.
+
+    Parameters
+    ----------
+    level : Grid
+        The full level.
+    drone_map : Grid
+        Currently known map for the drone, updated in place.
+    drone : list
+        Coordinates of the drone.
+
+    Returns
+    -------
+    list[list]
+        [row, column, content] of every cell that was unknown before.
+    """
+    return visibility.reveal(level, drone_map, drone_position)
+
+def update_map(level: Grid, drone_map: Grid, drone_position: list) -> Grid:
     """
     Updates the drone map from the level with the current drone position.
 
     Parameters
     ----------
-    level : list[list]
+    level : Grid
         Currently known map for the drone.
-    drone_map : list[list]
+    drone_map : Grid
         Currently known map for the drone.
     drone : list
         Coordinates of the drone.
 
     Returns
     -------
-    list[list]
+    Grid
         returns the updated map
     """
-    x_max = len(drone_map)
-    y_max = len(drone_map[0])
-
-    # all cells surrounding the drone position are now visible (including diagonals)
-    for i in range(x_max):
-        for j in range(y_max):
-            if (abs(i - drone_position[0]) <= 1) and (abs(j - drone_position[1]) <= 1):
-                drone_map[i][j] = level[i][j]
+    reveal_cells(level, drone_map, drone_position)
     return drone_map
 
-# sets available functions as tools for the API
-available_functions = types.Tool(
-    function_declarations=[
-        schema_check_positions, 
-        schema_check_map,
-        schema_check_walkable,
-        schema_move_north,
-        schema_move_south,
-        schema_move_west,
-        schema_move_east,
-    ],
-)
+def describe_revealed(revealed: list[list]) -> str:
+    """
+    Describes the cells revealed by a move.
 
+    Parameters
+    ----------
+    revealed : list[list]
+        [row, column, content] of the revealed cells.
+
+    Returns
+    -------
+    str
+        Text giving the revealed cells.
+    """
+    if not revealed:
+        return 'No new cells were revealed.'
+    return f'Newly revealed cells as [row, column, content]: {revealed}'
+
+# names of the functions declared as tools, usable without the Gemini SDK
+function_names = [
+    'check_positions',
+    'check_map',
+    'check_walkable',
+    'move_north',
+    'move_south',
+    'move_west',
+    'move_east',
+    'move_sequence',
+    'navigate_to',
+]
+
+# sets available functions as tools for the API
+def _available_functions(types):
+    return types.Tool(
+        function_declarations=[__getattr__(f'schema_{name}') for name in function_names],
+    )
+
+def __getattr__(name: str):
+    # the schemas and tools need the Gemini SDK, they are built when first used so the
+    # simulator can be imported without it
+    if name in globals():
+        return globals()[name]
+    if not (name.startswith('schema_') or name == 'available_functions') or f'_{name}' not in globals():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from google.genai import types
+    value = globals()[name] = globals()[f'_{name}'](types)
+    return value
@@ -1,59 +1,234 @@
-from google.genai import types
-
+from config import full_map_after_move
+from . import allowed_functions
 from .allowed_functions import *
 
-def call_function(function_call: dict, verbose: bool = False) -> types.Content:
+class ArgumentError(ValueError):
+    """
+    Raised by the functions for malformed arguments of a function call, returned to the model as an error.
     """
-    Looks through the content of the directory.
+
+def _positions(state, **args) -> list:
+    return [('check_positions', check_positions(state.drone_position, state.target_position))]
+
+def _map(state, **args) -> list:
+    return [('check_map', check_map(state.drone_map, state.drone_position))]
+
+def _walkable(state, **args) -> list:
+    return [('check_walkable', check_walkable(state.drone_map, state.drone_position))]
+
+def _step(state, direction: str) -> dict:
+    """
+    Moves the drone of an episode one step and reveals its surroundings.
 
     Parameters
     ----------
-    function_call : dict
+    state : EpisodeState
+        State of the episode, updated in place.
+    direction : str
+        One of 'north', 'south', 'west' or 'east'.
+
+    Returns
+    -------
+    {'text', 'success', 'revealed'}
+        'text': Explanation what happened
+        'success': Returns whether the movement was successful
+        'revealed': [row, column, content] of the cells revealed by the move
+    """
+    movement = move_functions[direction](state.drone_map, state.drone_position)
+    movement['revealed'] = []
+    if movement['success']:
+        dx, dy = DIRECTIONS[direction]
+        state.drone_position[0] += dx
+        state.drone_position[1] += dy
+        movement['revealed'] = reveal_cells(state.level, state.drone_map, state.drone_position)
+        state.moves += 1
+    return movement
+
+def _move_handler(direction: str):
+    name = f'move_{direction}'
+
+    def handler(state, **args) -> list:
+        results = []
+        movement = _step(state, direction)
+        if movement['success']:
+            if full_map_after_move:
+                results.append(('view_surroundings', f'This is the updated map after you moved {map_text(state.drone_map, state.drone_position)}'))
+            else:
+                results.append(('view_surroundings', describe_revealed(movement['revealed'])))
+        results.append((name, movement['text']))
+        results.append(('check_walkable', check_walkable(state.drone_map, state.drone_position)))
+        return results
+
+    return handler
+
+def _move_sequence(state, directions=None, **args) -> list:
+    if directions is None:
+        directions = []
+    if not isinstance(directions, list) or not all(isinstance(direction, str) for direction in directions):
+        raise ArgumentError(f'The directions have to be a list of north, south, west or east, got {directions!r}')
+    unknown = [direction for direction in directions if direction not in DIRECTIONS]
+    if unknown:
+        return [('move_sequence', f'Unknown directions {unknown}, use north, south, west or east')]
+
+    # apply the moves in order with the same checks as the single moves, stop at the first that fails
+    path = []
+    revealed = []
+    stop = None
+    for direction in directions:
+        movement = _step(state, direction)
+        if not movement['success']:
+            stop = f"Move {len(path) + 1} ({direction}) was not possible: {movement['text']}"
+            break
+        path.append(list(state.drone_position))
+        revealed.extend(movement['revealed'])
+
+    text = f'{len(path)} of {len(directions)} moves succeeded, the drone moved along {path} and is at position {state.drone_position}.'
+    if stop is not None:
+        text += f' {stop}'
+    return [
+        ('view_surroundings', describe_revealed(revealed)),
+        ('move_sequence', text),
+        ('check_walkable', check_walkable(state.drone_map, state.drone_position)),
+    ]
+
+def _whole_number(value) -> bool:
+    # whole numbers may arrive as floats or strings from the model, booleans are no numbers
+    if isinstance(value, bool):
+        return False
+    try:
+        return float(value).is_integer()
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+def _navigate(state, row=None, column=None, **args) -> list:
+    if row is None or column is None:
+        return [('navigate_to', 'Give the row and column of the position to move to')]
+    if not (_whole_number(row) and _whole_number(column)):
+        raise ArgumentError(f'The row and column have to be whole numbers, got {row!r} and {column!r}')
+    target = [int(float(row)), int(float(column))]
+    plan = plan_navigation(state.drone_map, state.drone_position, target)
+    if not plan['success']:
+        return [('navigate_to', plan['text'])]
+
+    # known free cells stay free, so the planned moves only stop early if something unexpected is in the way
+    path = []
+    revealed = []
+    for direction in plan['directions']:
+        movement = _step(state, direction)
+        if not movement['success']:
+            break
+        path.append(list(state.drone_position))
+        revealed.extend(movement['revealed'])
+
+    if state.drone_position == target:
+        text = f'The drone moved along {path} and reached {target}.'
+    else:
+        text = f'The drone moved along {path} and stopped at {state.drone_position} before reaching {target}.'
+    return [
+        ('view_surroundings', describe_revealed(revealed)),
+        ('navigate_to', text),
+        ('check_walkable', check_walkable(state.drone_map, state.drone_position)),
+    ]
+
+move_functions = {
+    'north': move_north,
+    'south': move_south,
+    'west': move_west,
+    'east': move_east,
+}
+
+# maps the names of the tools to the functions executing them on an episode
+function_map = {
+    'check_positions': _positions,
+    'check_map': _map,
+    'check_walkable': _walkable,
+    'move_north': _move_handler('north'),
+    'move_south': _move_handler('south'),
+    'move_west': _move_handler('west'),
+    'move_east': _move_handler('east'),
+    'move_sequence': _move_sequence,
+    'navigate_to': _navigate,
+}
+
+# functions that can move the drone
+moving_functions = {'move_north', 'move_south', 'move_west', 'move_east', 'move_sequence', 'navigate_to'}
+
+# short descriptions used when printing the steps of an episode
+function_descriptions = {
+    'check_positions': 'Verify coordinates.',
+    'check_map': 'Review the map.',
+    'check_walkable': 'Check free directions.',
+    'move_north': 'Move north:',
+    'move_south': 'Move south:',
+    'move_west': 'Move west:',
+    'move_east': 'Move east:',
+    'move_sequence': 'Move in sequence:',
+    'navigate_to': 'Navigate:',
+}
+
+def __getattr__(name: str):
+    # the tool declarations need the Gemini SDK and are built by allowed_functions when first used
+    if name.startswith('schema_') or name == 'available_functions':
+        return getattr(allowed_functions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def call_function(function_call: 'types.FunctionCall', state, verbose: bool = False) -> 'list[types.Part]':
+    """
+    Executes a function call of the model on the state of an episode.
+
+    Parameters
+    ----------
+    function_call : types.FunctionCall
         containing function name and arguments.
+    state : EpisodeState
+        State of the episode the function acts on.
     verbose : boolean, optional
         whether the function should be verbose
 
     Returns
     -------
-    types.Content
-        the function response or an error response.
+    list[types.Part]
+        the function responses or an error response.
     """
-    
+
+    types = state.message_types
+
     # Output if verbose
     if verbose:
         print(f"Calling function: {function_call.name}({function_call.args})")
-    else:
-        print(f" - Calling function: {function_call.name}")
-        
+
     # Verify name
     function_name = function_call.name or ""
-    
+
     # Check if function_name appears in the list of available functions
     if not function_name in function_map.keys():
         # return an error as content that the function did not exist
-        return types.Content(
-            role="tool",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
-        )
+        return [
+            types.Part.from_function_response(
+                name=function_name,
+                response={"error": f"Unknown function: {function_name}"},
+            )
+        ]
     else:
         args = dict(function_call.args) if function_call.args else {}
 
-        
         # get results from running the function with its arguments
-        function_result = function_map[function_name](**args)
-        
-        # return the result
-        return types.Content(
-            role="tool",
-            parts=[
+        try:
+            function_results = function_map[function_name](state, **args)
+        except ArgumentError as e:
+            # return an error as content that the arguments were malformed
+            return [
                 types.Part.from_function_response(
                     name=function_name,
-                    response={"result": function_result},
+                    response={"error": str(e)},
                 )
-            ],
-        )
\ No newline at end of file
+            ]
+
+        # return the results
+        return [
+            types.Part.from_function_response(
+                name=name,
+                response={"result": result},
+            )
+            for name, result in function_results
+        ]
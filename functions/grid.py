@@ -0,0 +1,130 @@
+class GridRow:
+    """
+    List-like view of a single row of a Grid.
+
+    Indexing and assignment go straight to the underlying buffer of the grid,
+    so code written for the old list[list[str]] maps keeps working.
+    """
+    __slots__ = ('grid', 'row')
+
+    def __init__(self, grid: 'Grid', row: int):
+        self.grid = grid
+        self.row = row
+
+    def __len__(self) -> int:
+        return self.grid.columns
+
+    def __getitem__(self, column):
+        if isinstance(column, slice):
+            return [chr(c) for c in self.grid.row_bytes(self.row)[column]]
+        if column < 0:
+            column += self.grid.columns
+        if not 0 <= column < self.grid.columns:
+            raise IndexError('grid column out of range')
+        return chr(self.grid.cells[self.row * self.grid.columns + column])
+
+    def __setitem__(self, column: int, value: str):
+        if column < 0:
+            column += self.grid.columns
+        if not 0 <= column < self.grid.columns:
+            raise IndexError('grid column out of range')
+        self.grid.cells[self.row * self.grid.columns + column] = ord(value)
+
+    def __iter__(self):
+        return (chr(c) for c in self.grid.row_bytes(self.row))
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class Grid:
+    """
+    Compact 2 dimensional map with one byte per cell.
+
+    The cells are stored row by row in a single bytearray. grid[i][j] returns
+    the one character string of the cell, as for the old list[list[str]] maps.
+    """
+    __slots__ = ('rows', 'columns', 'cells')
+
+    def __init__(self, rows: int, columns: int, fill: str = ' ', cells=None):
+        self.rows = rows
+        self.columns = columns
+        if cells is None:
+            cells = bytearray(fill.encode('ascii') * (rows * columns))
+        elif len(cells) != rows * columns:
+            raise ValueError('Number of cells does not match the grid size')
+        self.cells = cells
+
+    @classmethod
+    def from_rows(cls, rows) -> 'Grid':
+        """
+        Creates a grid from a list of rows.
+
+        Parameters
+        ----------
+        rows : list[list[str]] or list[str]
+            Rows of the map, all of the same length.
+
+        Returns
+        -------
+        Grid
+            Grid containing the given cells.
+        """
+        rows = [''.join(row) for row in rows]
+        if len(set(len(row) for row in rows)) > 1:
+            raise ValueError('Rows are not of equal length')
+        columns = len(rows[0]) if rows else 0
+        return cls(len(rows), columns, cells=bytearray(''.join(rows).encode('ascii')))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.rows, self.columns
+
+    def index(self, x: int, y: int) -> int:
+        return x * self.columns + y
+
+    def inside(self, x: int, y: int) -> bool:
+        return 0 <= x < self.rows and 0 <= y < self.columns
+
+    def get(self, x: int, y: int) -> str:
+        return chr(self.cells[x * self.columns + y])
+
+    def set(self, x: int, y: int, value: str):
+        self.cells[x * self.columns + y] = ord(value)
+
+    def row_bytes(self, x: int):
+        return self.cells[x * self.columns:(x + 1) * self.columns]
+
+    def copy(self) -> 'Grid':
+        return Grid(self.rows, self.columns, cells=bytearray(self.cells))
+
+    def to_list(self) -> list[list[str]]:
+        """
+        Returns the grid as list of lists of one character strings.
+        """
+        return [[chr(c) for c in self.row_bytes(x)] for x in range(self.rows)]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, x: int) -> GridRow:
+        if x < 0:
+            x += self.rows
+        if not 0 <= x < self.rows:
+            raise IndexError('grid row out of range')
+        return GridRow(self, x)
+
+    def __iter__(self):
+        return (GridRow(self, x) for x in range(self.rows))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Grid):
+            return self.shape == other.shape and bytes(self.cells) == bytes(other.cells)
+        return self.to_list() == [list(row) for row in other]
+
+    def __repr__(self) -> str:
+        # Same text as the old list[list[str]] maps, so the messages to the model do not change
+        return repr(self.to_list())
@@ -0,0 +1,88 @@
+import re
+
+from .grid import Grid
+
+def known_bounds(drone_map: Grid) -> tuple[int, int, int, int] | None:
+    """
+    Bounding box of the known cells of a map.
+
+    Parameters
+    ----------
+    drone_map : Grid
+        Currently known map for the drone.
+
+    Returns
+    -------
+    (int, int, int, int) or None
+        First and last row, first and last column, all included. None if no cell is known.
+    """
+    top = bottom = None
+    left, right = drone_map.columns, -1
+    for x in range(drone_map.rows):
+        row = bytes(drone_map.row_bytes(x))
+        unknown_before = len(row) - len(row.lstrip(b'?'))
+        if unknown_before == len(row):
+            continue
+        if top is None:
+            top = x
+        bottom = x
+        left = min(left, unknown_before)
+        right = max(right, len(row.rstrip(b'?')) - 1)
+    if top is None:
+        return None
+    return top, bottom, left, right
+
+def run_length_encode(row: str, minimum: int) -> str:
+    """
+    Writes runs of at least minimum '?' or 'X' as character*count, e.g. '?*12'.
+    """
+    if minimum < 2:
+        return row
+    return re.sub(
+        r'([?X])\1{%d,}' % (minimum - 1),
+        lambda match: f'{match.group(1)}*{len(match.group(0))}',
+        row,
+    )
+
+def encode_rows(drone_map: Grid, drone_position: list | None = None, crop_known: bool = True, window: int | None = None, run_length: int = 0) -> str:
+    """
+    Compact text of a map: one line per row with its row number, cropped to a part of the map.
+
+    Parameters
+    ----------
+    drone_map : Grid
+        Currently known map for the drone.
+    drone_position : list, optional
+        Coordinates of the drone, needed for the window.
+    crop_known : bool, optional
+        Only show the bounding box of the known cells.
+    window : int, optional
+        Only show the rows and columns up to this many cells away from the drone.
+    run_length : int, optional
+        Runs of at least this many '?' or 'X' are written as character*count, 0 writes every cell.
+
+    Returns
+    -------
+    str
+        Text of the map.
+    """
+    top, bottom, left, right = 0, drone_map.rows - 1, 0, drone_map.columns - 1
+    if crop_known:
+        bounds = known_bounds(drone_map)
+        if bounds is None:
+            return 'No cells of the map are known yet.'
+        top, bottom, left, right = bounds
+    if window is not None and drone_position is not None:
+        x, y = drone_position
+        top, bottom = max(top, x - window), min(bottom, x + window)
+        left, right = max(left, y - window), min(right, y + window)
+
+    lines = [
+        f'rows {top} to {bottom} and columns {left} to {right}, cells outside of them are not shown. '
+        f'Every line is row|cells| with the cells starting at column {left}'
+        + (f', runs like ?*{run_length} stand for that many equal cells.' if run_length >= 2 else '.')
+    ]
+    for x in range(top, bottom + 1):
+        row = bytes(drone_map.row_bytes(x)[left:right + 1]).decode('ascii')
+        lines.append(f'{x}|{run_length_encode(row, run_length)}|')
+    return '\n'.join(lines)
@@ -0,0 +1,160 @@
+import heapq
+from array import array
+from collections import deque
+
+from .grid import Grid
+
+FREE = ord(' ')
+
+def breadth_first_search(grid: Grid, start: list, stop=None) -> tuple[array, array, int | None]:
+    """
+    Searches the free cells of a map outwards from a start cell.
+
+    Parameters
+    ----------
+    grid : Grid
+        Map to search, only ' ' cells are entered.
+    start : list
+        Coordinates of the start cell.
+    stop : callable, optional
+        Called with the flat index of every reached cell, the search ends when it returns True.
+
+    Returns
+    -------
+    (array, array, int or None)
+        Distance from the start of every cell (-1 if not reached), the flat index of the
+        cell every cell was reached from (-1 for the start and unreached cells) and the
+        flat index of the cell the search stopped at, if any.
+    """
+    columns, rows = grid.columns, grid.rows
+    cells = grid.cells
+    distance = array('i', [-1]) * (rows * columns)
+    parent = array('i', [-1]) * (rows * columns)
+
+    first = grid.index(*start)
+    distance[first] = 0
+    queue = deque([first])
+    while queue:
+        index = queue.popleft()
+        if stop is not None and stop(index):
+            return distance, parent, index
+        x, y = divmod(index, columns)
+        step = distance[index] + 1
+        # neighbours in the order north, south, west, east
+        for neighbour, inside in (
+            (index - columns, x > 0),
+            (index + columns, x < rows - 1),
+            (index - 1, y > 0),
+            (index + 1, y < columns - 1),
+        ):
+            if inside and distance[neighbour] < 0 and cells[neighbour] == FREE:
+                distance[neighbour] = step
+                parent[neighbour] = index
+                queue.append(neighbour)
+    return distance, parent, None
+
+def distance_field(grid: Grid, target: list) -> array:
+    """
+    Computes the length of the shortest path from every free cell to the target.
+
+    Parameters
+    ----------
+    grid : Grid
+        Map to search.
+    target : list
+        Coordinates of the target.
+
+    Returns
+    -------
+    array
+        Distance of every cell in flat index order, -1 for cells that cannot reach the target.
+    """
+    distance, _, _ = breadth_first_search(grid, target)
+    return distance
+
+def a_star(grid: Grid, start: list, goal: list) -> list[str] | None:
+    """
+    Finds a shortest path over the free cells of a map, guided by the Manhattan distance.
+
+    Only the cells that are looked at are stored, so short paths on large maps stay cheap.
+
+    Parameters
+    ----------
+    grid : Grid
+        Map to search, only ' ' cells are entered.
+    start : list
+        Coordinates of the start cell.
+    goal : list
+        Coordinates of the goal cell.
+
+    Returns
+    -------
+    list[str] or None
+        Directions leading from start to goal, None if there is no path.
+    """
+    columns, rows = grid.columns, grid.rows
+    cells = grid.cells
+    x_goal, y_goal = goal
+    first, last = grid.index(*start), grid.index(*goal)
+
+    distance = {first: 0}
+    parent = {first: -1}
+    queue = [(abs(start[0] - x_goal) + abs(start[1] - y_goal), 0, first)]
+    while queue:
+        _, steps, index = heapq.heappop(queue)
+        if index == last:
+            return path_directions(grid, parent, last)
+        if steps > distance[index]:
+            continue
+        x, y = divmod(index, columns)
+        for neighbour, inside in (
+            (index - columns, x > 0),
+            (index + columns, x < rows - 1),
+            (index - 1, y > 0),
+            (index + 1, y < columns - 1),
+        ):
+            if not inside or cells[neighbour] != FREE:
+                continue
+            if steps + 1 < distance.get(neighbour, steps + 2):
+                distance[neighbour] = steps + 1
+                parent[neighbour] = index
+                x_neighbour, y_neighbour = divmod(neighbour, columns)
+                estimate = steps + 1 + abs(x_neighbour - x_goal) + abs(y_neighbour - y_goal)
+                heapq.heappush(queue, (estimate, steps + 1, neighbour))
+    return None
+
+def path_directions(grid: Grid, parent, goal: int) -> list[str]:
+    """
+    Follows the parents of a search back from the goal.
+
+    Parameters
+    ----------
+    grid : Grid
+        Map that was searched.
+    parent : array or dict
+        Parents as returned by breadth_first_search, -1 for the start.
+    goal : int
+        Flat index of the goal cell.
+
+    Returns
+    -------
+    list[str]
+        Directions leading from the start of the search to the goal.
+    """
+    columns = grid.columns
+    directions = []
+    index = goal
+    while parent[index] >= 0:
+        x, y = divmod(index, columns)
+        x_previous, y_previous = divmod(parent[index], columns)
+        if x < x_previous:
+            directions.append('north')
+        elif x > x_previous:
+            directions.append('south')
+        elif y < y_previous:
+            directions.append('west')
+        else:
+            directions.append('east')
+        index = parent[index]
+    directions.reverse()
+    return directions
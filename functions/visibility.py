@@ -0,0 +1,170 @@
+import hashlib
+from array import array
+
+from .grid import Grid
+
+WALL = ord('X')
+
+def line_of_sight(dx: int, dy: int) -> tuple[list, list]:
+    """
+    Cells between the centre of a cell and the centre of the cell at offset (dx, dy).
+
+    Parameters
+    ----------
+    dx : int
+        Row offset.
+    dy : int
+        Column offset.
+
+    Returns
+    -------
+    (list, list)
+        Offsets of the cells the line passes through, and pairs of offsets the line
+        passes between diagonally. The line is blocked by a wall on one of the cells,
+        or by walls on both cells of a pair.
+    """
+    steps = max(abs(dx), abs(dy))
+    points = [(round(dx * k / steps), round(dy * k / steps)) for k in range(steps + 1)] if steps else [(0, 0)]
+    between = points[1:-1]
+    corners = [
+        ((x0, y1), (x1, y0))
+        for (x0, y0), (x1, y1) in zip(points, points[1:])
+        if x0 != x1 and y0 != y1
+    ]
+    return between, corners
+
+class Visibility:
+    """
+    Cells the drone sees around its position.
+
+    The drone sees all cells within radius steps in every direction, including the
+    diagonals (a square window, 3x3 for radius 1). With occlusion, a cell is only seen
+    if the line of sight to it does not pass through a wall or diagonally between two
+    walls; walls themselves are seen.
+
+    Without occlusion every position shares one window and a reveal copies the rows of
+    the window. With occlusion the visible cells of a position depend on the level, they
+    are computed once per level and position when first needed and kept in memory. The
+    levels are told apart by their content, so a level loaded again for every episode
+    shares the visible cells computed before.
+
+    Parameters
+    ----------
+    radius : int, optional
+        Number of cells the drone sees in every direction.
+    occlusion : bool, optional
+        Whether walls block the view.
+    max_levels : int, optional
+        Number of levels the visible cells are kept for, the least recently used is dropped first.
+    """
+
+    def __init__(self, radius: int = 1, occlusion: bool = False, max_levels: int = 8):
+        if radius < 1:
+            raise ValueError('The radius must be at least 1')
+        self.radius = radius
+        self.occlusion = occlusion
+        self.max_levels = max_levels
+        self.offsets = [
+            (dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+        ]
+        self.lines = {offset: line_of_sight(*offset) for offset in self.offsets}
+        # content key -> visible cells by position, least recently used first
+        self._masks = {}
+        # id of a Grid -> (Grid, content key), for the Grids used recently
+        self._keys = {}
+
+    def _key(self, level: Grid) -> tuple:
+        # content of a level, hashed once per Grid
+        entry = self._keys.get(id(level))
+        if entry is None or entry[0] is not level:
+            if len(self._keys) >= self.max_levels:
+                del self._keys[next(iter(self._keys))]
+            entry = self._keys[id(level)] = (level, (level.rows, level.columns, hashlib.sha256(level.cells).digest()))
+        return entry[1]
+
+    def visible(self, level: Grid, drone_position: list) -> array:
+        """
+        Flat indices of the cells seen from a position, taken from the cache of the level.
+
+        Parameters
+        ----------
+        level : Grid
+            The full level.
+        drone_position : list
+            Coordinates of the drone.
+
+        Returns
+        -------
+        array
+            Flat indices of the visible cells.
+        """
+        key = self._key(level)
+        masks = self._masks.pop(key, None)
+        if masks is None:
+            masks = {}
+            # drop the least recently used level when too many are kept
+            if len(self._masks) >= self.max_levels:
+                del self._masks[next(iter(self._masks))]
+        self._masks[key] = masks
+
+        x, y = drone_position
+        index = level.index(x, y)
+        mask = masks.get(index)
+        if mask is None:
+            mask = masks[index] = self._compute(level, x, y)
+        return mask
+
+    def _compute(self, level: Grid, x: int, y: int) -> array:
+        cells, rows, columns = level.cells, level.rows, level.columns
+        mask = array('i')
+        for (dx, dy), (between, corners) in self.lines.items():
+            if not (0 <= x + dx < rows and 0 <= y + dy < columns):
+                continue
+            if any(cells[(x + i) * columns + y + j] == WALL for i, j in between):
+                continue
+            if any(
+                cells[(x + i0) * columns + y + j0] == WALL and cells[(x + i1) * columns + y + j1] == WALL
+                for (i0, j0), (i1, j1) in corners
+            ):
+                continue
+            mask.append((x + dx) * columns + y + dy)
+        return mask
+
+    def reveal(self, level: Grid, drone_map: Grid, drone_position: list) -> list[list]:
+        """
+        Reveals the cells seen from the drone position on the drone map.
+
+        Parameters
+        ----------
+        level : Grid
+            The full level.
+        drone_map : Grid
+            Currently known map for the drone, updated in place.
+        drone_position : list
+            Coordinates of the drone.
+
+        Returns
+        -------
+        list[list]
+            [row, column, content] of every cell that was unknown before.
+        """
+        revealed = []
+        known, seen, columns = drone_map.cells, level.cells, drone_map.columns
+        if self.occlusion:
+            for index in self.visible(level, drone_position):
+                if known[index] != seen[index]:
+                    known[index] = seen[index]
+                    revealed.append([index // columns, index % columns, chr(seen[index])])
+            return revealed
+
+        # the same window for every position, only its rows are touched
+        x_drone, y_drone = drone_position
+        y_min, y_max = max(y_drone - self.radius, 0), min(y_drone + self.radius + 1, columns)
+        for i in range(max(x_drone - self.radius, 0), min(x_drone + self.radius + 1, drone_map.rows)):
+            start, end = i * columns + y_min, i * columns + y_max
+            if known[start:end] != seen[start:end]:
+                for k in range(start, end):
+                    if known[k] != seen[k]:
+                        revealed.append([i, k - i * columns, chr(seen[k])])
+                known[start:end] = seen[start:end]
+        return revealed
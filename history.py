@@ -0,0 +1,140 @@
+from functions.allowed_functions import check_positions, check_map
+
+def estimate_tokens(content: 'types.Content') -> int:
+    """
+    Roughly estimates the number of tokens of a message, about four characters per token.
+
+    Parameters
+    ----------
+    content : types.Content
+        Message to estimate.
+
+    Returns
+    -------
+    int
+        Estimated number of tokens.
+    """
+    characters = 0
+    for part in content.parts or []:
+        if part.text is not None:
+            characters += len(part.text)
+        if part.function_call is not None:
+            characters += len(part.function_call.name or '') + len(str(part.function_call.args or ''))
+        if part.function_response is not None:
+            characters += len(part.function_response.name or '') + len(str(part.function_response.response or ''))
+    return characters // 4 + 1
+
+class HistoryManager:
+    """
+    Keeps the messages sent to the model within a budget.
+
+    The user prompt stays pinned at the start. When older steps have to be removed,
+    the starting messages are replaced by one message with the current positions and
+    known map, followed by the most recent steps that fit into the budget. A step is a
+    model message together with the function responses after it, so calls and
+    responses are never separated.
+
+    Parameters
+    ----------
+    max_messages : int, optional
+        Maximal number of messages sent to the model.
+    max_tokens : int, optional
+        Maximal estimated number of tokens sent to the model.
+    """
+
+    # number of episodes the last summary is kept for
+    MAX_SUMMARIES = 1024
+
+    def __init__(self, max_messages: int | None = None, max_tokens: int | None = None):
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        # id of an episode state -> (state, (position, moves), summary, estimated tokens)
+        self._summaries = {}
+
+    def _summary(self, state) -> tuple:
+        # the map only changes when the drone moves, so the summary is kept until the next move
+        version = (tuple(state.drone_position), state.moves)
+        cached = self._summaries.get(id(state))
+        if cached is not None and cached[0] is state and cached[1] == version:
+            return cached[2], cached[3]
+        summary = self.state_message(state)
+        if id(state) not in self._summaries and len(self._summaries) >= self.MAX_SUMMARIES:
+            del self._summaries[next(iter(self._summaries))]
+        self._summaries[id(state)] = (state, version, summary, estimate_tokens(summary))
+        return summary, self._summaries[id(state)][3]
+
+    def state_message(self, state) -> 'types.Content':
+        """
+        Summarizes the current state of the episode in one message.
+
+        Parameters
+        ----------
+        state : EpisodeState
+            State of the episode.
+
+        Returns
+        -------
+        types.Content
+            The message.
+        """
+        text = (
+            'Earlier steps were removed from the conversation. '
+            f'{check_positions(state.drone_position, state.target_position)} '
+            f'{check_map(state.drone_map, state.drone_position)}'
+        )
+        types = state.message_types
+        return types.Content(role="user", parts=[types.Part(text=text)])
+
+    def compact(self, messages: list, state) -> list:
+        """
+        Selects the messages sent to the model.
+
+        The summary of the current state, which contains the known map, is only built
+        when messages are dropped, and reused until the drone moves.
+
+        Parameters
+        ----------
+        messages : list
+            All messages of the episode.
+        state : EpisodeState
+            State of the episode.
+
+        Returns
+        -------
+        list
+            The messages itself if they fit into the budget, otherwise the pinned prompt,
+            the current state and the most recent steps.
+        """
+        if not messages:
+            return messages
+        if not self._exceeded(len(messages), sum(estimate_tokens(message) for message in messages)):
+            return messages
+
+        pinned = messages[:1]
+        summary, summary_tokens = self._summary(state)
+        used_messages = len(pinned) + 1
+        used_tokens = estimate_tokens(pinned[0]) + summary_tokens
+
+        # walk back from the most recent message and keep whole steps, at least one
+        kept_start = len(messages)
+        step_messages, step_tokens = 0, 0
+        for i in range(len(messages) - 1, 0, -1):
+            step_messages += 1
+            step_tokens += estimate_tokens(messages[i])
+            if messages[i].role != 'model':
+                continue
+            if kept_start < len(messages) and self._exceeded(used_messages + step_messages, used_tokens + step_tokens):
+                break
+            used_messages += step_messages
+            used_tokens += step_tokens
+            kept_start = i
+            step_messages, step_tokens = 0, 0
+
+        return pinned + [summary] + messages[kept_start:]
+
+    def _exceeded(self, message_count: int, token_count: int) -> bool:
+        if self.max_messages is not None and message_count > self.max_messages:
+            return True
+        if self.max_tokens is not None and token_count > self.max_tokens:
+            return True
+        return False
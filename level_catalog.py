@@ -0,0 +1,236 @@
+import os
+import json
+import hashlib
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+
+from functions.grid import Grid
+from functions.pathfinding import FREE
+from level_io import BINARY_EXTENSION, load_level
+
+LEVEL_EXTENSIONS = ('.lvl', BINARY_EXTENSION)
+
+def label_components(level: Grid) -> tuple[array, list[int]]:
+    """
+    Labels the connected regions of free cells of a level.
+
+    Parameters
+    ----------
+    level : Grid
+        The level.
+
+    Returns
+    -------
+    (array, list[int])
+        Region of every cell in flat index order (-1 for walls) and the number of cells of every region.
+    """
+    columns, rows = level.columns, level.rows
+    cells = bytes(level.cells)
+    labels = array('i', [-1]) * (rows * columns)
+    sizes = []
+
+    start = cells.find(b' ')
+    while start >= 0:
+        if labels[start] < 0:
+            label = len(sizes)
+            labels[start] = label
+            size = 0
+            queue = deque([start])
+            while queue:
+                index = queue.popleft()
+                size += 1
+                x, y = divmod(index, columns)
+                for neighbour, inside in (
+                    (index - columns, x > 0),
+                    (index + columns, x < rows - 1),
+                    (index - 1, y > 0),
+                    (index + 1, y < columns - 1),
+                ):
+                    if inside and labels[neighbour] < 0 and cells[neighbour] == FREE:
+                        labels[neighbour] = label
+                        queue.append(neighbour)
+            sizes.append(size)
+        start = cells.find(b' ', start + 1)
+    return labels, sizes
+
+@dataclass
+class LevelInfo:
+    """
+    Metadata of a level file.
+    """
+    level_file: str
+    hash: str
+    rows: int
+    columns: int
+    free_cells: int
+    component_sizes: list[int]
+    labels: array | None = field(default=None, repr=False)
+
+    @property
+    def components(self) -> int:
+        return len(self.component_sizes)
+
+    def component(self, position: list) -> int:
+        """
+        Returns the region of a cell, -1 for walls and positions outside the level.
+        """
+        x, y = position
+        if not (0 <= x < self.rows and 0 <= y < self.columns):
+            return -1
+        return self.labels[x * self.columns + y]
+
+    def connected(self, start: list, target: list) -> bool:
+        """
+        Returns whether there is a path between two free cells.
+        """
+        region = self.component(start)
+        return region >= 0 and region == self.component(target)
+
+class LevelCatalog:
+    """
+    Metadata and connected regions of level files, cached on disk.
+
+    Entries are kept per file with its modification time and size, the region labels
+    are stored per content hash, so levels are only analysed again after they changed.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory the catalog is stored in.
+    """
+
+    def __init__(self, directory: str = '.level_catalog'):
+        self.directory = directory
+        self._index_file = os.path.join(directory, 'catalog.json')
+        self._index = None
+        self._infos = {}
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            try:
+                with open(self._index_file, 'r') as f:
+                    self._index = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f'{self._index_file}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(temporary, self._index_file)
+
+    def _labels_file(self, digest: str) -> str:
+        return os.path.join(self.directory, f'{digest}.labels')
+
+    def info(self, level_file: str) -> LevelInfo:
+        """
+        Returns the metadata of a level file, analysing it only if it is new or changed.
+
+        Parameters
+        ----------
+        level_file : str
+            Path of the level file.
+
+        Returns
+        -------
+        LevelInfo
+            Metadata including the region labels.
+        """
+        path = os.path.abspath(level_file)
+        stat = os.stat(path)
+        index = self._load_index()
+        entry = index.get(path)
+        if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if entry is None or entry['hash'] != digest:
+                entry = self._analyse(level_file, digest)
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            index[path] = entry
+            self._save_index()
+
+        info = self._infos.get(entry['hash'])
+        if info is None:
+            labels = array('i')
+            with open(self._labels_file(entry['hash']), 'rb') as f:
+                labels.fromfile(f, entry['rows'] * entry['columns'])
+            info = LevelInfo(
+                level_file=level_file,
+                hash=entry['hash'],
+                rows=entry['rows'],
+                columns=entry['columns'],
+                free_cells=entry['free_cells'],
+                component_sizes=entry['component_sizes'],
+                labels=labels,
+            )
+            self._infos[entry['hash']] = info
+        return info
+
+    def _analyse(self, level_file: str, digest: str) -> dict:
+        # the same content may already be known under another name
+        for entry in self._load_index().values():
+            if entry['hash'] == digest and os.path.exists(self._labels_file(digest)):
+                return dict(entry)
+
+        level = load_level(level_file)
+        labels, sizes = label_components(level)
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f'{self._labels_file(digest)}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            labels.tofile(f)
+        os.replace(temporary, self._labels_file(digest))
+        return {
+            'hash': digest,
+            'rows': level.rows,
+            'columns': level.columns,
+            'free_cells': sum(sizes),
+            'component_sizes': sizes,
+        }
+
+    def levels(self, directory: str = './') -> list[LevelInfo]:
+        """
+        Lists the level files of a directory with their metadata.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Directory to look in.
+
+        Returns
+        -------
+        list[LevelInfo]
+            Metadata of all .lvl and .plv files, sorted by name. Corrupt files are left out.
+        """
+        infos = []
+        with os.scandir(directory) as content:
+            names = sorted(entry.name for entry in content if os.path.splitext(entry.name)[1] in LEVEL_EXTENSIONS and entry.is_file())
+        for name in names:
+            try:
+                infos.append(self.info(os.path.normpath(os.path.join(directory, name))))
+            except ValueError:
+                continue
+        return infos
+
+    def validate(self, level_file: str, start: list, target: list):
+        """
+        Checks that the target can be reached from the starting position.
+
+        Parameters
+        ----------
+        level_file : str
+            Path of the level file.
+        start : list
+            Starting coordinates of the drone, a free cell.
+        target : list
+            Coordinates of the target, a free cell.
+
+        Raises
+        ------
+        ValueError
+            If start and target are in different regions of the level.
+        """
+        if not self.info(level_file).connected(start, target):
+            raise ValueError("Target not reachable from drone position.")
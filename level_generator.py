@@ -0,0 +1,196 @@
+import random
+import argparse
+
+from functions.grid import Grid
+from level_io import write_level
+
+FREE = ord(' ')
+WALL = ord('X')
+
+def generate_maze(rows: int, columns: int, seed: int | None = None, loops: float = 0.0) -> Grid:
+    """
+    Generates a maze with corridors of width one.
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows, at least 3.
+    columns : int
+        Number of columns, at least 3.
+    seed : int, optional
+        Seed, the same seed gives the same level.
+    loops : float, optional
+        Fraction of the inner walls between corridors that is removed to create loops.
+
+    Returns
+    -------
+    Grid
+        The level, surrounded by walls.
+    """
+    rng = random.Random(seed)
+    level = Grid(rows, columns, fill='X')
+    cells = level.cells
+
+    # depth first search over the cells with odd coordinates, carving the wall between two cells
+    cells[columns + 1] = FREE
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        options = [
+            (dx, dy) for dx, dy in ((-2, 0), (2, 0), (0, -2), (0, 2))
+            if 1 <= x + dx <= rows - 2 and 1 <= y + dy <= columns - 2 and cells[(x + dx) * columns + y + dy] == WALL
+        ]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        cells[(x + dx // 2) * columns + y + dy // 2] = FREE
+        cells[(x + dx) * columns + y + dy] = FREE
+        stack.append((x + dx, y + dy))
+
+    if loops > 0:
+        for x in range(1, rows - 1):
+            for y in range(1, columns - 1):
+                # walls between two corridors in a straight line
+                index = x * columns + y
+                if cells[index] != WALL or rng.random() >= loops:
+                    continue
+                vertical = x % 2 == 0 and y % 2 == 1 and cells[index - columns] == FREE and cells[index + columns] == FREE
+                horizontal = x % 2 == 1 and y % 2 == 0 and cells[index - 1] == FREE and cells[index + 1] == FREE
+                if vertical or horizontal:
+                    cells[index] = FREE
+    return level
+
+def _carve(cells: bytearray, columns: int, x_min: int, x_max: int, y_min: int, y_max: int):
+    # frees the rectangle of rows x_min..x_max and columns y_min..y_max, both included
+    for x in range(x_min, x_max + 1):
+        cells[x * columns + y_min:x * columns + y_max + 1] = b' ' * (y_max - y_min + 1)
+
+def generate_rooms(rows: int, columns: int, seed: int | None = None, min_size: int = 3, max_size: int = 12) -> Grid:
+    """
+    Generates rectangular rooms connected by corridors.
+
+    The level is divided into blocks with one room each, the rooms of neighbouring
+    blocks are connected along a random spanning tree, so every room can be reached.
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows, at least 3.
+    columns : int
+        Number of columns, at least 3.
+    seed : int, optional
+        Seed, the same seed gives the same level.
+    min_size : int, optional
+        Minimal height and width of a room.
+    max_size : int, optional
+        Maximal height and width of a room.
+
+    Returns
+    -------
+    Grid
+        The level, surrounded by walls.
+    """
+    rng = random.Random(seed)
+    level = Grid(rows, columns, fill='X')
+    cells = level.cells
+
+    # blocks of the inner area, each with space for a room and a wall towards the next block
+    block_rows = max((rows - 2) // (max_size + 1), 1)
+    block_columns = max((columns - 2) // (max_size + 1), 1)
+    block_height = (rows - 2) // block_rows
+    block_width = (columns - 2) // block_columns
+
+    centres = {}
+    for i in range(block_rows):
+        for j in range(block_columns):
+            height = rng.randint(min(min_size, block_height - 1) or 1, max(block_height - 1, 1))
+            width = rng.randint(min(min_size, block_width - 1) or 1, max(block_width - 1, 1))
+            x = 1 + i * block_height + rng.randint(0, max(block_height - 1 - height, 0))
+            y = 1 + j * block_width + rng.randint(0, max(block_width - 1 - width, 0))
+            _carve(cells, columns, x, x + height - 1, y, y + width - 1)
+            centres[(i, j)] = (x + height // 2, y + width // 2)
+
+    # depth first search over the blocks, connecting the rooms of neighbouring blocks
+    visited = {(0, 0)}
+    stack = [(0, 0)]
+    while stack:
+        i, j = stack[-1]
+        options = [
+            (i + di, j + dj) for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if (i + di, j + dj) in centres and (i + di, j + dj) not in visited
+        ]
+        if not options:
+            stack.pop()
+            continue
+        block = rng.choice(options)
+        visited.add(block)
+        stack.append(block)
+        (x_from, y_from), (x_to, y_to) = centres[(i, j)], centres[block]
+        # L-shaped corridor, first along the row of the first room, then along the column of the second
+        _carve(cells, columns, x_from, x_from, min(y_from, y_to), max(y_from, y_to))
+        _carve(cells, columns, min(x_from, x_to), max(x_from, x_to), y_to, y_to)
+    return level
+
+def generate_field(rows: int, columns: int, seed: int | None = None, density: float = 0.2) -> Grid:
+    """
+    Generates an open field with randomly placed obstacles.
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows, at least 3.
+    columns : int
+        Number of columns, at least 3.
+    seed : int, optional
+        Seed, the same seed gives the same level.
+    density : float, optional
+        Probability of an inner cell to be an obstacle.
+
+    Returns
+    -------
+    Grid
+        The level, surrounded by walls. Parts of it may be cut off by obstacles.
+    """
+    rng = random.Random(seed)
+    level = Grid(rows, columns, fill='X')
+    cells = level.cells
+    for x in range(1, rows - 1):
+        row = bytes(WALL if rng.random() < density else FREE for _ in range(columns - 2))
+        cells[x * columns + 1:x * columns + columns - 1] = row
+    return level
+
+generators = {
+    'maze': generate_maze,
+    'rooms': generate_rooms,
+    'field': generate_field,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates levels for stress tests.")
+    parser.add_argument("kind", choices=generators.keys(), help="kind of level")
+    parser.add_argument("rows", type=int, help="number of rows")
+    parser.add_argument("columns", type=int, help="number of columns")
+    parser.add_argument("--seed", type=int, default=0, help="seed, the same seed gives the same level")
+    parser.add_argument("--loops", type=float, default=0.0, help="maze: fraction of inner walls removed to create loops")
+    parser.add_argument("--density", type=float, default=0.2, help="field: probability of an obstacle")
+    parser.add_argument("--output", help="level file, written in the binary format if it ends with .plv")
+    args = parser.parse_args()
+
+    if args.rows < 3 or args.columns < 3:
+        parser.error("levels need at least 3 rows and 3 columns")
+
+    if args.kind == 'maze':
+        level = generate_maze(args.rows, args.columns, seed=args.seed, loops=args.loops)
+    elif args.kind == 'field':
+        level = generate_field(args.rows, args.columns, seed=args.seed, density=args.density)
+    else:
+        level = generate_rooms(args.rows, args.columns, seed=args.seed)
+
+    output = args.output or f'{args.kind}_{args.rows}x{args.columns}_{args.seed}.lvl'
+    write_level(output, level)
+    print(f'Written {output}')
+
+
+if __name__ == "__main__":
+    main()
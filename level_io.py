@@ -0,0 +1,193 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+
+from functions.grid import Grid
+
+# Header of the binary level format: magic, version, reserved, rows, columns,
+# followed by one byte per cell, row by row
+BINARY_MAGIC = b'PFLV'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHII')
+BINARY_EXTENSION = '.plv'
+
+def write_text_level(level_file: str, level: Grid):
+    """
+    Writes a level in the .lvl text format, one row per line.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+    level : Grid
+        The level.
+    """
+    with open(level_file, 'wb') as f:
+        f.write(b'\n'.join(bytes(level.row_bytes(x)) for x in range(level.rows)))
+
+def write_binary_level(level_file: str, level: Grid):
+    """
+    Writes a level in the binary format.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+    level : Grid
+        The level.
+    """
+    with open(level_file, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, level.rows, level.columns))
+        f.write(level.cells)
+
+def read_binary_header(data) -> tuple[int, int]:
+    """
+    Checks the header of a binary level.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Content of the level file, at least the header.
+
+    Returns
+    -------
+    (int, int)
+        Number of rows and columns.
+
+    Raises
+    ------
+    ValueError
+        If the header or the size of the file is not valid.
+    """
+    if len(data) < BINARY_HEADER.size:
+        raise ValueError("Level file corrupt")
+    magic, version, _, rows, columns = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Level file corrupt")
+    if len(data) != BINARY_HEADER.size + rows * columns:
+        raise ValueError("Level file corrupt")
+    return rows, columns
+
+def read_binary_level(level_file: str) -> Grid:
+    """
+    Reads a level in the binary format into memory.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+
+    Returns
+    -------
+    Grid
+        The level.
+    """
+    with open(level_file, 'rb') as f:
+        data = f.read()
+    rows, columns = read_binary_header(data)
+    return Grid(rows, columns, cells=bytearray(data[BINARY_HEADER.size:]))
+
+def open_binary_level(level_file: str) -> Grid:
+    """
+    Opens a level in the binary format memory mapped.
+
+    The cells of the returned grid are a read-only view of the file, nothing is copied
+    and only the parts of the level that are used are read from disk.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+
+    Returns
+    -------
+    Grid
+        The level, read-only.
+    """
+    with open(level_file, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    rows, columns = read_binary_header(mapped)
+    return Grid(rows, columns, cells=memoryview(mapped)[BINARY_HEADER.size:])
+
+def read_text_level(level_file: str) -> Grid:
+    """
+    Reads a level in the .lvl text format.
+
+    The rows are checked and joined as bytes, without lists of single characters.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+
+    Returns
+    -------
+    Grid
+        The level.
+
+    Raises
+    ------
+    ValueError
+        If the level is empty or not of rectangular shape.
+    """
+    with open(level_file, 'rb') as f:
+        rows = [line.strip() for line in f.read().splitlines()]
+    columns = len(rows[0]) if rows else 0
+    # Check if the level is of rectangular shape
+    if columns == 0 or any(len(row) != columns for row in rows):
+        raise ValueError("Level file corrupt")
+    return Grid(len(rows), columns, cells=bytearray(b''.join(rows)))
+
+def load_level(level_file: str) -> Grid:
+    """
+    Loads a level, memory mapped for the binary format and read for the .lvl text format.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+
+    Returns
+    -------
+    Grid
+        The level.
+
+    Raises
+    ------
+    ValueError
+        If the level file is corrupt.
+    """
+    if level_file.endswith(BINARY_EXTENSION):
+        return open_binary_level(level_file)
+    return read_text_level(level_file)
+
+def write_level(level_file: str, level: Grid):
+    """
+    Writes a level, in the binary format if the file ends with .plv and as text otherwise.
+    """
+    if level_file.endswith(BINARY_EXTENSION):
+        write_binary_level(level_file, level)
+    else:
+        write_text_level(level_file, level)
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts levels between the .lvl text and the .plv binary format.")
+    parser.add_argument("levels", nargs="+", help="level files to convert")
+    args = parser.parse_args()
+
+    for level_file in args.levels:
+        base, extension = os.path.splitext(level_file)
+        output = base + ('.lvl' if extension == BINARY_EXTENSION else BINARY_EXTENSION)
+        try:
+            level = load_level(level_file)
+        except ValueError:
+            print(f"{level_file}: Level file corrupt")
+            sys.exit(1)
+        write_level(output, level)
+        print(f'{level_file} -> {output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,132 +1,51 @@
-import os
 import sys
 import argparse
 
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-
-from config import system_prompt, user_prompt, model_name
-from functions.call_function import available_functions
-from functions.allowed_functions import *
-
-def generate_response(client: genai.Client, messages: list):
+from config import user_prompt
+from backends import BACKENDS, create_client, create_backend
+from response_cache import ResponseCache
+from prompt_cache import PROMPT_CACHE_MODES, create_prompt_cache
+from scheduler import RequestScheduler, retryable
+from history import HistoryManager
+from tracing import Tracer
+from level_catalog import LevelCatalog, LevelInfo
+from renderer import Renderer, show_level
+from checkpoint import Checkpointer, load_checkpoint
+from functions.grid import Grid
+from episode import load_level, validate_positions, start_episode, step, stream_step
+
+def get_level_list(catalog: LevelCatalog) -> list[LevelInfo]:
     """
-    Generates response from client with current set of messages.
+    Generates list of all .lvl and .plv files in the directory.
 
     Parameters
     ----------
-    client : genai.Client
-        Client used.
-    message : list
-        list of messages used
-
-    Returns
-    -------
-    response
-        response from the model.
-    """
-    response = client.models.generate_content(
-        model=model_name, 
-        contents=messages,
-        config=types.GenerateContentConfig(
-            tools=[available_functions], 
-            system_instruction=system_prompt,
-        ),
-    )
-    return response
-
-def get_level_list() -> list[str]:
-    """
-    Generates list of all .lvl files in the directory.
+    catalog : LevelCatalog
+        Catalog with the cached metadata of the levels.
 
     Returns
     -------
-    list[str]
-        list of all .lvl file names in directory
+    list[LevelInfo]
+        metadata of all level files in directory, sorted by name
     """
-    level_list = []
-    directory_content = os.listdir(os.path.abspath('./'))
-    for content in directory_content:
-        content_source = os.path.join('./', content)
-        if os.path.isfile(content_source):
-            base, extension = os.path.splitext(content)
-            if extension == '.lvl':
-                level_list.append(content)
-    return level_list
+    return catalog.levels('./')
 
-def show_level(map: list[list], drone: list, target: list) -> str:
+def choose_episode(catalog: LevelCatalog) -> tuple[str, Grid, list, list]:
     """
-    Generates a printable output from the level and the positions of drone and target.
+    Asks for the level and the positions of drone and target.
 
     Parameters
     ----------
-    map: list[list]
-        map to be shown.
-    drone : list
-        Coordinates of the drone.
-    drone : list
-        Coordinates of the target.
+    catalog : LevelCatalog
+        Catalog with the cached metadata of the levels.
 
     Returns
     -------
-    str
-        Output text with formatting
-    """
-    x_max, y_max = len(map), len(map[0])
-
-    printout = ''
-    for i in range(x_max):
-        for j in range(y_max):
-            if [i,j] == drone and [i,j] == target:
-                printout += '\033[92m'+'D'+'\033[0m'
-            elif [i,j] == drone:
-                printout += '\033[91m'+'D'+'\033[0m'
-            elif [i,j] == target:
-                printout += '\033[96m'+'T'+'\033[0m'
-            else:
-                printout += map[i][j]
-        if i < x_max - 1:
-            printout += '\n'
-    return printout
-
-def create_drone_map(level: list[list], drone: list) -> list[list]:
+    (str, Grid, list, list)
+        Level file, level, starting coordinates of the drone and coordinates of the target.
     """
-    Generates a map for the drone_view.
-
-    Parameters
-    ----------
-    level: list[list]
-        level.
-    drone : list
-        Coordinates of the drone.
-
-    Returns
-    -------
-    list[list]
-        The known map for the drone, all '?', except the location of the drone itself
-    """
-    x_max, y_max = len(level), len(level[0])
-    x_drone, y_drone = drone
-
-    drone_map = [['?' for _ in range(y_max)] for _ in range(x_max)]
-    drone_map[x_drone][y_drone] = level[x_drone][y_drone]
-    
-    return drone_map
-
-def main():
-    load_dotenv()
-    
-    # Obtain API key
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if api_key == None:
-        raise RuntimeError("Api key not found!")
-
-    # Initiate gemini client
-    client = genai.Client(api_key=api_key)
-    
     # Create list of available levels
-    level_list = get_level_list()
+    level_list = get_level_list(catalog)
 
     # Ask for which level to use
     if level_list == []:
@@ -135,35 +54,23 @@ def main():
     else:
         while True:
             print("Available level:")
-            for i,level in enumerate(level_list):
-                print(f'{i}: {level}')
+            for i,info in enumerate(level_list):
+                print(f'{i}: {info.level_file} ({info.rows}x{info.columns}, {info.free_cells} free cells, {info.components} regions)')
             number = input('Which level (input the number)? ')
             if number.isdigit():
                 if 0 <= int(number) < len(level_list):
-                    level_file = level_list[int(number)]
+                    level_file = level_list[int(number)].level_file
                     break
 
     # Open the level
-    with open(level_file, "r") as f:
-        level = []
-        row_length = []
-        for line in f:
-            if line == None:
-                print("Level file corrupt")
-                sys.exit(1)
-            row = []
-            text = line.strip()
-            for char in text:
-                row.append(char)
-            level.append(row)
-            row_length.append(len(row))
-        # Check if the level is of rectangular shape
-        if len(set(row_length)) > 1:
-            print("Level file corrupt")
-            sys.exit(1)
+    try:
+        level = load_level(level_file)
+    except ValueError:
+        print("Level file corrupt")
+        sys.exit(1)
 
     # Set level size
-    level_size = (len(level),len(level[0]))
+    level_size = level.shape
 
     # Ask for starting drone position and target position
     while True:
@@ -187,201 +94,142 @@ def main():
             print("Target position not valid. \n Try again:")
             continue
 
-        if level[drone_position[0]][drone_position[1]] != ' ':
-            print("Drone not in open space. \n Try again:")
-            continue
-        if level[target_position[0]][target_position[1]] != ' ':
-            print("Target not in open space. \n Try again:")
+        try:
+            validate_positions(level, drone_position, target_position)
+            catalog.validate(level_file, drone_position, target_position)
+        except ValueError as e:
+            print(f"{e} \n Try again:")
             continue
         break
-    
-    # Create drone view
-    drone_map = create_drone_map(level, drone_position)
-    drone_map = update_map(level, drone_map, drone_position)
 
-    print('Map visible to the drone:')
-    print(show_level(drone_map, drone_position, target_position))
-
-    # Compile user prompt as message, as well as the starting locations and the starting map known to the drone
-    messages = [types.Content(role="user", parts=[types.Part(text=user_prompt)])]
-    messages.append(types.Content(role="user", parts=[types.Part(text=check_positions(drone_position, target_position))]))
-    messages.append(types.Content(role="user", parts=[types.Part(text=check_map(drone_map))]))
-
-    # To make sure that the system terminates, we limit to a total of 1000 function executions, but ask if user wants to terminate every 100
-    for counter in range(1000):
-        if counter % 100 == 0 and counter > 0:
-            exitquestion = input('End pathfinding? (y/n) ')
-            if exitquestion == 'y':
-                print("User stopped search!")
-                sys.exit(1)
+    return level_file, level, drone_position, target_position
 
-        # get response with current messages from gemini
+def main():
+    parser = argparse.ArgumentParser(description="Lets Gemini move a drone through a level.")
+    parser.add_argument("--cache", choices=ResponseCache.MODES, help="record responses to or replay them from the response cache")
+    parser.add_argument("--cache-dir", default=".response_cache", help="directory of the response cache")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="Gemini or a local scripted stand-in")
+    parser.add_argument("--seed", type=int, help="seed of the scripted backends")
+    parser.add_argument("--history-messages", type=int, help="maximal number of messages sent per request")
+    parser.add_argument("--history-tokens", type=int, help="maximal estimated number of tokens sent per request")
+    parser.add_argument("--trace", help="JSONL file timings and token counts of every step are written to")
+    parser.add_argument("--rpm", type=float, help="maximal requests per minute to Gemini")
+    parser.add_argument("--tpm", type=float, help="maximal tokens per minute to Gemini")
+    parser.add_argument("--max-retries", type=int, default=6, help="retries of a request failing with a rate limit or server error")
+    parser.add_argument("--prompt-cache", choices=PROMPT_CACHE_MODES, help="send system prompt, tools and user prompt once as cached content on Gemini or in memory")
+    parser.add_argument("--prompt-cache-ttl", type=int, default=3600, help="seconds the cached content lives, it is refreshed while in use")
+    parser.add_argument("--stream", action="store_true", help="stream responses, showing text and executing function calls as soon as they arrive")
+    parser.add_argument("--render", choices=("ansi", "plain", "off"), help="redraw the map in place, print it after every move or show nothing (default: ansi in a terminal)")
+    parser.add_argument("--render-every", type=int, default=1, help="only render every n-th move")
+    parser.add_argument("--viewport", help="rows and columns of the map shown, as ROWSxCOLUMNS")
+    parser.add_argument("--checkpoint", help="file the episode is saved to every few steps")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="steps between two checkpoints")
+    parser.add_argument("--resume", help="checkpoint to continue an episode from, also saved to unless --checkpoint is given")
+    args = parser.parse_args()
+
+    viewport = None
+    if args.viewport:
         try:
-            response = generate_response(client, messages)
-        except genai.errors.ServerError:
-            print("Model is overloaded. Try again later.")
-            
-        
-        # take the candidates from the response and append them to the current list of messages
-        candidates = response.candidates
-        if candidates:
-            for candidate in candidates:
-                messages.append(candidate)
-
-        # check whether there was any meta data found with the response
-        meta_data = response.usage_metadata
-        if meta_data == None:
-            raise RuntimeError("No Meta-data found!")
-                
-        # get the list of function calls from the response
-        function_call_list = response.function_calls
-        function_responses = []
-        
-        if function_call_list != None:
-            for function_call in function_call_list:
-                # Check if the functions are any of the known functions
-                if function_call.name == 'check_positions':
-                    function_call_result = types.Content(
-                        role="tool",
-                        parts=[
-                            types.Part.from_function_response(
-                                name='get_position',
-                                response={"result": check_positions(drone_position, target_position)},
-                            )
-                        ]
-                    )
-                    function_responses.append(function_call_result.parts[0])
-
-                    print(f'Step {counter}: Verify coordinates.')
-                elif function_call.name == 'check_map':
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_map(drone_map)},
-                            )
-                    )
-
-                    print(f'Step {counter}: Review the map.')
-                elif function_call.name == 'check_walkable':
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_walkable(drone_map, drone_position)},
-                            )
-                    )
-
-                    print(f'Step {counter}: Check free directions.')
-                elif function_call.name == 'move_north':
-                    movement = move_north(drone_map, drone_position)
-                    if movement['success']:
-                        drone_position[0] -= 1
-                        drone_map = update_map(level, drone_map, drone_position)
-                        function_responses.append(types.Part.from_function_response(
-                                name='view_surroundings',
-                                response={"result": f'This is the updated map after you moved {drone_map}'},
-                            )
-                        )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": movement['text']},
-                            )
-                    )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_walkable(drone_map, drone_position)},
-                            )
-                    )
-
-                    print(f'Step {counter}: Move north:')
-                    print(f'{show_level(drone_map, drone_position, target_position)}')
-                    print(f'Open spaces: {check_walkable(drone_map, drone_position)}')
-                elif function_call.name == 'move_south':
-                    movement = move_south(drone_map, drone_position)
-                    if movement['success']:
-                        drone_position[0] += 1
-                        drone_map = update_map(level, drone_map, drone_position)
-                        function_responses.append(types.Part.from_function_response(
-                                name='view_surroundings',
-                                response={"result": f'This is the updated map after you moved {drone_map}'},
-                            )
-                        )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_south',
-                                response={"result": movement['text']},
-                            )
-                    )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_walkable(drone_map, drone_position)},
-                            )
-                    )
-                    
-                    print(f'Step {counter}: Move south:')
-                    print(f'{show_level(drone_map, drone_position, target_position)}')
-                    print(f'Open spaces: {check_walkable(drone_map, drone_position)}')
-                elif function_call.name == 'move_west':
-                    movement = move_west(drone_map, drone_position)
-                    if movement['success']:
-                        drone_position[1] -= 1
-                        drone_map = update_map(level, drone_map, drone_position)
-                        function_responses.append(types.Part.from_function_response(
-                                name='view_surroundings',
-                                response={"result": f'This is the updated map after you moved {drone_map}'},
-                            )
-                        )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_west',
-                                response={"result": movement['text']},
-                            )
-                    )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_walkable(drone_map, drone_position)},
-                            )
-                    )
+            viewport = tuple(int(size) for size in args.viewport.lower().split('x'))
+        except ValueError:
+            parser.error("viewport must be given as ROWSxCOLUMNS")
+        if len(viewport) != 2:
+            parser.error("viewport must be given as ROWSxCOLUMNS")
+    render = args.render or ('ansi' if sys.stdout.isatty() else 'plain')
+    renderer = None
+    if render != 'off':
+        renderer = Renderer(every=args.render_every, viewport=viewport, ansi=render == 'ansi')
+
+    cache = ResponseCache(args.cache_dir, mode=args.cache) if args.cache else None
+    history = None
+    if args.history_messages or args.history_tokens:
+        history = HistoryManager(max_messages=args.history_messages, max_tokens=args.history_tokens)
+
+    # Obtain API key and initiate the gemini client, the scripted backends and replaying from the cache work offline
+    client = create_client(args.backend, args.cache)
+
+    client, prompt_cache = create_prompt_cache(client, args.prompt_cache, ttl=args.prompt_cache_ttl)
+    scheduler = RequestScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, max_retries=args.max_retries, seed=args.seed)
+    backend = create_backend(args.backend, client=client, cache=cache, seed=args.seed, scheduler=scheduler, prompt_cache=prompt_cache)
+    
+    if args.resume:
+        try:
+            state = load_checkpoint(args.resume, backend=backend)
+        except (OSError, ValueError) as e:
+            print(e)
+            sys.exit(1)
+        print(f'Resuming {state.level_file} after {state.steps} steps.')
+        if state.finished:
+            print("Response:")
+            print(state.final_text)
+            sys.exit(0)
+    else:
+        level_file, level, drone_position, target_position = choose_episode(LevelCatalog())
+
+        # Create drone view and the starting messages
+        state = start_episode(level_file, level, drone_position, target_position, user_prompt, backend=backend)
+
+    checkpointer = None
+    if args.checkpoint or args.resume:
+        checkpointer = Checkpointer(args.checkpoint or args.resume, every=args.checkpoint_every)
+
+    if renderer is not None:
+        renderer.message('Map visible to the drone:')
+        renderer.render(state, force=True)
+
+    trace_file = open(args.trace, "w") if args.trace else None
+    tracer = Tracer(trace_file, episode=state.level_file) if args.trace else None
+
+    try:
+        # To make sure that the system terminates, we limit to a total of 1000 function executions, but ask if user wants to terminate every 100
+        for counter in range(state.steps, 1000):
+            if counter % 100 == 0 and counter > 0:
+                exitquestion = input('End pathfinding? (y/n) ')
+                if exitquestion == 'y':
+                    print("User stopped search!")
+                    sys.exit(1)
+
+            # get response with current messages from gemini and execute the function calls
+            try:
+                done = (stream_step if args.stream else step)(backend, state, history=history, tracer=tracer, renderer=renderer)
+            except Exception as e:
+                # rate limit and server errors were already retried by the scheduler
+                if not retryable(e):
+                    raise
+                print("Model is overloaded. Try again later.")
+                sys.exit(1)
 
-                    print(f'Step {counter}: Move west:')
-                    print(f'{show_level(drone_map, drone_position, target_position)}')
-                    print(f'Open spaces: {check_walkable(drone_map, drone_position)}')
-                elif function_call.name == 'move_east':
-                    movement = move_east(drone_map, drone_position)
-                    if movement['success']:
-                        drone_position[1] += 1
-                        drone_map = update_map(level, drone_map, drone_position)
-                        function_responses.append(types.Part.from_function_response(
-                                name='view_surroundings',
-                                response={"result": f'This is the updated map after you moved {drone_map}'},
-                            )
-                        )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_east',
-                                response={"result": movement['text']},
-                            )
-                    )
-                    function_responses.append(types.Part.from_function_response(
-                                name='move_north',
-                                response={"result": check_walkable(drone_map, drone_position)},
-                            )
-                    )
+            if checkpointer is not None:
+                checkpointer.update(state)
 
-                    print(f'Step {counter}: Move east:')
-                    print(f'{show_level(drone_map, drone_position, target_position)}')
-                    print(f'Open spaces: {check_walkable(drone_map, drone_position)}')
-                else:
-                    print(f'Step {counter}: Tried to use function {function_call.name}. It does not exist:')                    
-                    
-            # add the function responses to the messages list
-            messages.append(types.Content(role="user", parts=function_responses))
-        else:
-            # if there were no new function calls, print the response of the client
-            print("Response:")
-            if response.text == None:
-                print('No response, terminated with "None"')
+            # if there were no function calls, print the response of the client below the map
+            if done:
+                if renderer is not None:
+                    renderer.close()
+                print("Response:")
+                if state.final_text == None:
+                    print('No response, terminated with "None"')
+                    break
+                print(state.final_text)
                 break
-            print(response.text)
-            break
-    else:
-        # if loop terminated let user know that the client did not get to a final response
-        print("Gemini did not reach a final response!")
-        sys.exit(1)
+        else:
+            # if loop terminated let user know that the client did not get to a final response
+            if renderer is not None:
+                renderer.close()
+            print("Gemini did not reach a final response!")
+            sys.exit(1)
+    finally:
+        if checkpointer is not None:
+            checkpointer.save(state)
+        if prompt_cache is not None:
+            prompt_cache.close()
+        if renderer is not None:
+            renderer.close()
+        if tracer is not None:
+            summary = tracer.close()
+            trace_file.close()
+            print(f"Model time p50/p95: {summary['model_time_p50']}/{summary['model_time_p95']} s, "
+                  f"tokens: {summary['total_tokens']}, tokens per move: {summary['tokens_per_move']}")
 
 
 if __name__ == "__main__":
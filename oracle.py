@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from array import array
+
+from functions.grid import Grid
+from functions.pathfinding import distance_field
+from level_io import load_level
+
+def file_hash(level_file: str) -> str:
+    """
+    sha256 hex digest of the content of a level file.
+    """
+    with open(level_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class DistanceCache:
+    """
+    Shortest path distances over the full levels, cached per level content and target.
+
+    A distance field gives for every cell the length of the shortest path to the target
+    (-1 if the target cannot be reached). Fields are kept in memory and stored on disk,
+    keyed on the sha256 of the level file, so one search per distinct target is enough
+    for any number of episodes.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory the distance fields are stored in, None keeps them in memory only.
+    max_fields : int, optional
+        Number of distance fields kept in memory.
+    """
+
+    def __init__(self, directory: str | None = '.oracle_cache', max_fields: int = 64):
+        self.directory = directory
+        self.max_fields = max_fields
+        self.searches = 0
+        self._hashes = {}
+        self._levels = {}
+        self._fields = {}
+
+    def level_hash(self, level_file: str) -> str:
+        """
+        Returns the content hash of a level file, only rehashing when the file changed.
+        """
+        stat = os.stat(level_file)
+        key = (os.path.abspath(level_file), stat.st_mtime_ns, stat.st_size)
+        if key not in self._hashes:
+            self._hashes[key] = file_hash(level_file)
+        return self._hashes[key]
+
+    def level(self, level_file: str) -> Grid:
+        """
+        Returns the level of a level file.
+        """
+        digest = self.level_hash(level_file)
+        if digest not in self._levels:
+            self._levels[digest] = load_level(level_file)
+        return self._levels[digest]
+
+    def distances(self, level_file: str, target: list) -> array:
+        """
+        Returns the distance field of a target.
+
+        Parameters
+        ----------
+        level_file : str
+            Path of the level file.
+        target : list
+            Coordinates of the target.
+
+        Returns
+        -------
+        array
+            Distance of every cell in flat index order, -1 for cells that cannot reach the target.
+        """
+        digest = self.level_hash(level_file)
+        key = (digest, target[0], target[1])
+        if key in self._fields:
+            return self._fields[key]
+
+        path = None
+        if self.directory is not None:
+            path = os.path.join(self.directory, digest, f'{target[0]}_{target[1]}.dist')
+            if os.path.exists(path):
+                level = self.level(level_file)
+                field = array('i')
+                with open(path, 'rb') as f:
+                    field.fromfile(f, level.rows * level.columns)
+                self._remember(key, field)
+                return field
+
+        field = distance_field(self.level(level_file), target)
+        self.searches += 1
+        self._remember(key, field)
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as f:
+                field.tofile(f)
+            os.replace(temporary, path)
+        return field
+
+    def _remember(self, key: tuple, field: array):
+        # drop the oldest field when too many are kept in memory
+        if len(self._fields) >= self.max_fields:
+            del self._fields[next(iter(self._fields))]
+        self._fields[key] = field
+
+    def shortest_path_length(self, level_file: str, start: list, target: list) -> int | None:
+        """
+        Returns the length of the shortest path from start to target, None if there is none.
+        """
+        level = self.level(level_file)
+        distance = self.distances(level_file, target)[level.index(*start)]
+        return distance if distance >= 0 else None
+
+    def score(self, level_file: str, start: list, target: list, moves: int, reached: bool) -> dict:
+        """
+        Compares the moves of an episode with the shortest path.
+
+        Parameters
+        ----------
+        level_file : str
+            Path of the level file.
+        start : list
+            Starting coordinates of the drone.
+        target : list
+            Coordinates of the target.
+        moves : int
+            Number of successful moves of the drone.
+        reached : bool
+            Whether the drone reached the target.
+
+        Returns
+        -------
+        dict
+            'optimal': length of the shortest path (None if unreachable),
+            'moves': moves of the drone,
+            'wasted': moves beyond the shortest path (None if the target was not reached),
+            'efficiency': optimal / moves, 1 for a shortest path, 0 if the target was not reached.
+        """
+        optimal = self.shortest_path_length(level_file, start, target)
+        if not reached or optimal is None:
+            return {'optimal': optimal, 'moves': moves, 'wasted': None, 'efficiency': 0.0}
+        return {
+            'optimal': optimal,
+            'moves': moves,
+            'wasted': moves - optimal,
+            'efficiency': optimal / moves if moves else 1.0,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Scores the results of runner.py against the shortest paths.")
+    parser.add_argument("results", help="JSONL results written by runner.py --output")
+    parser.add_argument("--cache-dir", default=".oracle_cache", help="directory of the cached distance fields")
+    args = parser.parse_args()
+
+    oracle = DistanceCache(args.cache_dir)
+    scores = []
+    with open(args.results, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if result.get('error'):
+                continue
+            # results use positions starting from 1
+            start = [result['start'][0]-1, result['start'][1]-1]
+            target = [result['target'][0]-1, result['target'][1]-1]
+            scores.append(oracle.score(result['level'], start, target, result['moves'], result['success']))
+
+    if scores == []:
+        print("No results found!")
+        sys.exit(1)
+
+    successful = [score for score in scores if score['wasted'] is not None]
+    print(f'Episodes: {len(scores)}, reached the target: {len(successful)}')
+    print(f'Mean efficiency: {sum(score["efficiency"] for score in scores) / len(scores):.3f}')
+    if successful:
+        print(f'Mean wasted moves of successful episodes: {sum(score["wasted"] for score in successful) / len(successful):.1f}')
+    print(f'Searches run: {oracle.searches}')
+
+
+if __name__ == "__main__":
+    main()
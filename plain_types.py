@@ -0,0 +1,115 @@
+# plain classes standing in for the message classes of the Gemini SDK. Runs with a
+# scripted backend never send a request, so they do not need to import the SDK. The
+# plain classes have the fields and methods of the SDK classes used by the episodes and
+# dump to the same JSON, so checkpoints and traces look the same.
+
+def sdk_types():
+    """
+    Message classes of the Gemini SDK, i.e. google.genai.types, imported when first needed.
+    """
+    from google.genai import types
+    return types
+
+def _dump(value, mode: str, exclude_none: bool):
+    if isinstance(value, _Model):
+        return value.model_dump(mode=mode, exclude_none=exclude_none)
+    if isinstance(value, list):
+        return [_dump(item, mode, exclude_none) for item in value]
+    if isinstance(value, dict):
+        return {key: _dump(item, mode, exclude_none) for key, item in value.items()}
+    return value
+
+class _Model:
+    # names of the fields, all None by default
+    fields = ()
+    # field -> plain class of its value, or of the items if the value is a list
+    nested = {}
+
+    def __init__(self, **values):
+        for name in self.fields:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f'{type(self).__name__} has no fields {sorted(values)}')
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.fields)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.fields)})"
+
+    def model_dump(self, mode: str = 'python', exclude_none: bool = False) -> dict:
+        data = {}
+        for name in self.fields:
+            value = getattr(self, name)
+            if value is None and exclude_none:
+                continue
+            data[name] = _dump(value, mode, exclude_none)
+        return data
+
+    def model_copy(self, update: dict | None = None):
+        values = {name: getattr(self, name) for name in self.fields}
+        values.update(update or {})
+        return type(self)(**values)
+
+    @classmethod
+    def model_validate(cls, data):
+        if isinstance(data, cls):
+            return data
+        values = {}
+        for name, value in data.items():
+            # fields the plain classes do not have, e.g. of a checkpoint written with the SDK, are left out
+            if name not in cls.fields:
+                continue
+            nested = cls.nested.get(name)
+            if nested is not None and value is not None:
+                value = [nested.model_validate(item) for item in value] if isinstance(value, list) else nested.model_validate(value)
+            values[name] = value
+        return cls(**values)
+
+class FunctionCall(_Model):
+    fields = ('id', 'args', 'name')
+
+class FunctionResponse(_Model):
+    fields = ('id', 'name', 'response')
+
+class Part(_Model):
+    fields = ('thought', 'function_call', 'function_response', 'text')
+    nested = {'function_call': FunctionCall, 'function_response': FunctionResponse}
+
+    @classmethod
+    def from_function_call(cls, name: str, args: dict) -> 'Part':
+        return cls(function_call=FunctionCall(name=name, args=args))
+
+    @classmethod
+    def from_function_response(cls, name: str, response: dict) -> 'Part':
+        return cls(function_response=FunctionResponse(name=name, response=response))
+
+class Content(_Model):
+    fields = ('parts', 'role')
+    nested = {'parts': Part}
+
+class Candidate(_Model):
+    fields = ('content', 'finish_reason')
+    nested = {'content': Content}
+
+class GenerateContentResponseUsageMetadata(_Model):
+    fields = ('candidates_token_count', 'prompt_token_count', 'total_token_count')
+
+class GenerateContentResponse(_Model):
+    fields = ('candidates', 'usage_metadata')
+    nested = {'candidates': Candidate, 'usage_metadata': GenerateContentResponseUsageMetadata}
+
+    def _parts(self) -> list:
+        if not self.candidates or self.candidates[0].content is None:
+            return []
+        return self.candidates[0].content.parts or []
+
+    @property
+    def text(self) -> str | None:
+        texts = [part.text for part in self._parts() if part.text is not None and not part.thought]
+        return ''.join(texts) if texts else None
+
+    @property
+    def function_calls(self) -> list | None:
+        calls = [part.function_call for part in self._parts() if part.function_call is not None]
+        return calls if calls else None
@@ -0,0 +1,326 @@
+import time
+import asyncio
+import datetime
+import itertools
+
+from config import system_prompt, model_name
+from functions import allowed_functions
+
+def _timestamp(expire_time: datetime.datetime | None) -> float | None:
+    return expire_time.timestamp() if expire_time is not None else None
+
+class PromptCache:
+    """
+    Cached content on the Gemini API for the static start of every request.
+
+    The system prompt, the tools and the user prompt (the first message of an episode)
+    are stored once per user prompt with client.caches and referenced by name from every
+    request, which then only sends the remaining messages. A cache is refreshed when its
+    expiry comes closer than refresh seconds and created again if it expired already, and
+    deleted by close.
+
+    Gemini only caches content above a minimal number of tokens. If creating the cache
+    for a prompt fails, requests with that prompt are sent without a cache.
+
+    Parameters
+    ----------
+    client : genai.Client or LocalCacheClient
+        Client the caches are created with.
+    model : str, optional
+        Model the caches are created for, it has to be the model of the requests.
+    ttl : int, optional
+        Seconds a cache lives after it was created or refreshed.
+    refresh : int, optional
+        Seconds before the expiry a cache is refreshed.
+    """
+
+    def __init__(self, client, model: str = model_name, ttl: int = 3600, refresh: int = 300):
+        self.client = client
+        self.model = model
+        self.ttl = ttl
+        self.refresh = refresh
+        # user prompt -> [name, expiry timestamp], name is None if the cache could not be created
+        self.handles = {}
+        self.created = 0
+        self.refreshed = 0
+        self._locks = {}
+
+    def _create_config(self, prompt: str) -> 'types.CreateCachedContentConfig':
+        from google.genai import types
+        return types.CreateCachedContentConfig(
+            system_instruction=system_prompt,
+            tools=[allowed_functions.available_functions],
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            ttl=f'{self.ttl}s',
+            display_name='pathfinder prompt',
+        )
+
+    def _update_config(self) -> 'types.UpdateCachedContentConfig':
+        from google.genai import types
+        return types.UpdateCachedContentConfig(ttl=f'{self.ttl}s')
+
+    def _created(self, prompt: str, cached: 'types.CachedContent | None'):
+        if cached is None:
+            self.handles[prompt] = [None, None]
+            return
+        self.created += 1
+        self.handles[prompt] = [cached.name, _timestamp(cached.expire_time) or time.time() + self.ttl]
+
+    def _refreshed(self, handle: list, cached: 'types.CachedContent'):
+        self.refreshed += 1
+        handle[1] = _timestamp(cached.expire_time) or time.time() + self.ttl
+
+    def _expiring(self, handle: list) -> bool:
+        return handle[0] is not None and handle[1] - time.time() < self.refresh
+
+    @staticmethod
+    def _gone(error: Exception) -> bool:
+        # the cache expired before it was refreshed, e.g. while the run was idle for longer
+        # than the ttl; it is created again. LocalCaches raises a KeyError
+        return isinstance(error, KeyError) or getattr(error, 'code', None) in (403, 404)
+
+    def name(self, prompt: str) -> str | None:
+        """
+        Name of the cache for a user prompt, created or refreshed if needed.
+
+        Parameters
+        ----------
+        prompt : str
+            The user prompt.
+
+        Returns
+        -------
+        str or None
+            Name of the cached content, None if the prompt is not cached.
+        """
+        from google.genai import errors
+
+        handle = self.handles.get(prompt)
+        if handle is not None and self._expiring(handle):
+            try:
+                self._refreshed(handle, self.client.caches.update(name=handle[0], config=self._update_config()))
+            except (errors.ClientError, KeyError) as e:
+                if not self._gone(e):
+                    raise
+                del self.handles[prompt]
+        if prompt not in self.handles:
+            try:
+                cached = self.client.caches.create(model=self.model, config=self._create_config(prompt))
+            except errors.ClientError as e:
+                print(f'The prompt could not be cached, requests are sent without a cache: {e}')
+                cached = None
+            self._created(prompt, cached)
+        return self.handles[prompt][0]
+
+    async def aname(self, prompt: str) -> str | None:
+        """
+        Same as name, for use in an event loop. Concurrent episodes with the same prompt share one cache.
+        """
+        from google.genai import errors
+
+        async with self._locks.setdefault(prompt, asyncio.Lock()):
+            handle = self.handles.get(prompt)
+            if handle is not None and self._expiring(handle):
+                try:
+                    self._refreshed(handle, await self.client.aio.caches.update(name=handle[0], config=self._update_config()))
+                except (errors.ClientError, KeyError) as e:
+                    if not self._gone(e):
+                        raise
+                    del self.handles[prompt]
+            if prompt not in self.handles:
+                try:
+                    cached = await self.client.aio.caches.create(model=self.model, config=self._create_config(prompt))
+                except errors.ClientError as e:
+                    print(f'The prompt could not be cached, requests are sent without a cache: {e}')
+                    cached = None
+                self._created(prompt, cached)
+            return self.handles[prompt][0]
+
+    @staticmethod
+    def prompt(messages: list) -> str | None:
+        """
+        The user prompt of a conversation, i.e. the text of its first message.
+        """
+        if not messages or messages[0].role != 'user' or len(messages[0].parts) != 1:
+            return None
+        return messages[0].parts[0].text
+
+    def request(self, name: str | None, messages: list) -> 'tuple[list, types.GenerateContentConfig]':
+        """
+        Contents and config of a request using the cache of the given name.
+
+        Parameters
+        ----------
+        name : str or None
+            Name of the cached content, see name.
+        messages : list
+            All messages of the conversation, starting with the user prompt.
+
+        Returns
+        -------
+        (list, types.GenerateContentConfig)
+            The messages to send and the config of the request.
+        """
+        from google.genai import types
+
+        if name is None:
+            return messages, types.GenerateContentConfig(
+                tools=[allowed_functions.available_functions],
+                system_instruction=system_prompt,
+            )
+        return messages[1:], types.GenerateContentConfig(cached_content=name)
+
+    def close(self):
+        """
+        Deletes all caches created, so they do not keep being stored until they expire.
+        """
+        for name, _ in self.handles.values():
+            if name is not None:
+                self.client.caches.delete(name=name)
+        self.handles = {}
+
+class LocalCaches:
+    """
+    In-memory stand-in for client.caches, with the create, get, update and delete calls used by PromptCache.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._counter = itertools.count(1)
+
+    def _expiry(self, ttl: str) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=float(ttl.rstrip('s')))
+
+    def create(self, model: str, config: 'types.CreateCachedContentConfig') -> 'types.CachedContent':
+        from google.genai import types
+
+        name = f'cachedContents/local-{next(self._counter)}'
+        cached = types.CachedContent(name=name, model=model, display_name=config.display_name, expire_time=self._expiry(config.ttl or '3600s'))
+        self.entries[name] = (cached, config)
+        return cached
+
+    def get(self, name: str) -> 'types.CachedContent':
+        cached, config = self.entries[name]
+        if cached.expire_time < datetime.datetime.now(datetime.timezone.utc):
+            del self.entries[name]
+            raise KeyError(f'{name} expired')
+        return cached
+
+    def update(self, name: str, config: 'types.UpdateCachedContentConfig') -> 'types.CachedContent':
+        cached = self.get(name)
+        cached.expire_time = self._expiry(config.ttl)
+        return cached
+
+    def delete(self, name: str):
+        self.entries.pop(name, None)
+
+    def expand(self, contents: list, config: 'types.GenerateContentConfig | None') -> 'tuple[list, types.GenerateContentConfig | None]':
+        """
+        Replaces a reference to a cache in a request by the cached contents, system prompt and tools.
+        """
+        if config is None or config.cached_content is None:
+            return contents, config
+        cached = self.get(config.cached_content)
+        stored = self.entries[cached.name][1]
+        config = config.model_copy(update={
+            'cached_content': None,
+            'system_instruction': stored.system_instruction,
+            'tools': stored.tools,
+        })
+        return list(stored.contents or []) + list(contents), config
+
+class _AsyncLocalCaches:
+    def __init__(self, caches: LocalCaches):
+        self.caches = caches
+
+    async def create(self, model: str, config: 'types.CreateCachedContentConfig') -> 'types.CachedContent':
+        return self.caches.create(model=model, config=config)
+
+    async def update(self, name: str, config: 'types.UpdateCachedContentConfig') -> 'types.CachedContent':
+        return self.caches.update(name=name, config=config)
+
+    async def delete(self, name: str):
+        self.caches.delete(name=name)
+
+class _LocalModels:
+    def __init__(self, models, caches: LocalCaches):
+        self.models = models
+        self.caches = caches
+
+    def generate_content(self, model: str, contents: list, config: 'types.GenerateContentConfig | None' = None):
+        contents, config = self.caches.expand(contents, config)
+        return self.models.generate_content(model=model, contents=contents, config=config)
+
+    def generate_content_stream(self, model: str, contents: list, config: 'types.GenerateContentConfig | None' = None):
+        contents, config = self.caches.expand(contents, config)
+        return self.models.generate_content_stream(model=model, contents=contents, config=config)
+
+class LocalCacheClient:
+    """
+    Client keeping cached content in memory instead of on the Gemini API.
+
+    Requests referencing a cache are expanded to the full request and passed on to the
+    wrapped client, e.g. to compare cached and uncached runs or to test offline with a
+    stand-in client.
+
+    Parameters
+    ----------
+    client : genai.Client or None
+        Client the expanded requests are sent with, None if no request is sent.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.caches = LocalCaches()
+        self.models = _LocalModels(client.models, self.caches) if getattr(client, 'models', None) is not None else None
+        self.aio = _AsyncLocalClient(client, self.caches)
+
+class _AsyncLocalClient:
+    def __init__(self, client, caches: LocalCaches):
+        self.caches = _AsyncLocalCaches(caches)
+        aio = getattr(client, 'aio', None)
+        self.models = _AsyncLocalModels(aio.models, caches) if aio is not None else None
+
+class _AsyncLocalModels(_LocalModels):
+    async def generate_content(self, model: str, contents: list, config: 'types.GenerateContentConfig | None' = None):
+        contents, config = self.caches.expand(contents, config)
+        return await self.models.generate_content(model=model, contents=contents, config=config)
+
+    async def generate_content_stream(self, model: str, contents: list, config: 'types.GenerateContentConfig | None' = None):
+        contents, config = self.caches.expand(contents, config)
+        return await self.models.generate_content_stream(model=model, contents=contents, config=config)
+
+# where cached content is kept: on the Gemini API or in memory
+PROMPT_CACHE_MODES = ('gemini', 'local')
+
+def create_prompt_cache(client, mode: str | None, model: str = model_name, ttl: int = 3600) -> tuple:
+    """
+    Prompt cache for a client.
+
+    Parameters
+    ----------
+    client : genai.Client or None
+        Client of the run. 'gemini' needs one, without it requests are only replayed
+        from the response cache and no cache is created. 'local' also works without
+        a client, e.g. when replaying from the response cache.
+    mode : str or None
+        One of PROMPT_CACHE_MODES, None for no cache.
+    model : str, optional
+        Model of the requests.
+    ttl : int, optional
+        Seconds a cache lives after it was created or refreshed.
+
+    Returns
+    -------
+    (client, PromptCache or None)
+        The client to send requests with, wrapped in a LocalCacheClient for 'local', and the prompt cache.
+    """
+    if mode is None:
+        return client, None
+    if mode not in PROMPT_CACHE_MODES:
+        raise ValueError(f'Unknown prompt cache: {mode}')
+    if mode == 'local':
+        client = LocalCacheClient(client)
+    elif client is None:
+        return client, None
+    return client, PromptCache(client, model=model, ttl=ttl)
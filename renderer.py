@@ -0,0 +1,215 @@
+import sys
+import shutil
+
+from functions.allowed_functions import check_walkable
+from functions.grid import Grid
+
+DRONE = '\033[91m' + 'D' + '\033[0m'
+TARGET = '\033[96m' + 'T' + '\033[0m'
+DRONE_ON_TARGET = '\033[92m' + 'D' + '\033[0m'
+
+# bytes marking drone and target in a frame, the maps only contain ' ', 'X' and '?'
+DRONE_MARK, TARGET_MARK, DRONE_ON_TARGET_MARK = 1, 2, 3
+MARKS = {DRONE_MARK: DRONE, TARGET_MARK: TARGET, DRONE_ON_TARGET_MARK: DRONE_ON_TARGET}
+
+def show_level(map: Grid, drone: list, target: list, window: tuple | None = None) -> str:
+    """
+    Generates a printable output from the level and the positions of drone and target.
+
+    Parameters
+    ----------
+    map: Grid
+        map to be shown.
+    drone : list
+        Coordinates of the drone.
+    target : list
+        Coordinates of the target.
+    window : tuple, optional
+        First row, first column, number of rows and columns of the part to show, the whole map if not given.
+
+    Returns
+    -------
+    str
+        Output text with formatting
+    """
+    top, left, height, width = window or (0, 0, map.rows, map.columns)
+    return '\n'.join(
+        ''.join(MARKS.get(cell, chr(cell)) for cell in row) if any(cell in MARKS for cell in row) else row.decode()
+        for row in frame_rows(map, drone, target, top, left, height, width)
+    )
+
+def frame_rows(map: Grid, drone: list, target: list, top: int, left: int, height: int, width: int) -> list[bytes]:
+    """
+    Cuts a window out of a map, with drone and target marked by DRONE_MARK, TARGET_MARK and DRONE_ON_TARGET_MARK.
+
+    Returns
+    -------
+    list[bytes]
+        One bytes object per row of the window.
+    """
+    drone_x, drone_y = drone
+    target_x, target_y = target
+    on_target = drone_x == target_x and drone_y == target_y
+    rows = []
+    for x in range(top, top + height):
+        row = map.row_bytes(x)[left:left + width]
+        if x == drone_x or x == target_x:
+            row = bytearray(row)
+            if x == target_x and left <= target_y < left + width:
+                row[target_y - left] = TARGET_MARK
+            if x == drone_x and left <= drone_y < left + width:
+                row[drone_y - left] = DRONE_ON_TARGET_MARK if on_target else DRONE_MARK
+        rows.append(bytes(row))
+    return rows
+
+def _away_from_border(position: int, start: int, size: int, total: int) -> bool:
+    # whether a coordinate is in the window and a quarter of its size away from its border,
+    # borders of the window that are borders of the map do not count
+    margin = size // 4
+    low = start + margin if start > 0 else 0
+    high = start + size - margin if start + size < total else total
+    return low <= position < high
+
+class Renderer:
+    """
+    Shows the map known to the drone while an episode runs.
+
+    Without ANSI every rendered map is printed below the previous one. With ANSI the map
+    is drawn once and afterwards only the cells that changed are redrawn, using cursor
+    positioning. Maps larger than the viewport are shown in a window that is centred on
+    the drone again whenever the drone comes close to its border.
+
+    Parameters
+    ----------
+    output : file, optional
+        File written to, sys.stdout if not given.
+    every : int, optional
+        Only every n-th map is rendered, 0 disables all output.
+    viewport : tuple[int, int], optional
+        Rows and columns shown. Defaults to the terminal size with ANSI and to the whole map without.
+    ansi : bool, optional
+        Whether to redraw in place with ANSI cursor positioning.
+    """
+
+    def __init__(self, output=None, every: int = 1, viewport: tuple[int, int] | None = None, ansi: bool = False):
+        self.output = output
+        self.every = every
+        self.viewport = viewport
+        self.ansi = ansi
+        self.renders = 0
+        self._frame = None
+        self._window = None
+        # message shown above the first frame, and whether text was shown below the frame
+        self._header = None
+        self._written = False
+
+    def _write(self, text: str):
+        output = self.output if self.output is not None else sys.stdout
+        output.write(text)
+        output.flush()
+
+    def message(self, text: str):
+        """
+        Shows a line of text, in the status line above the map with ANSI.
+
+        The cursor is saved and restored around it, so text shown with partial continues
+        where it stopped.
+        """
+        if self.every == 0:
+            return
+        if self.ansi and self._frame is None:
+            self._header = text
+        elif self.ansi:
+            self._write(f'\0337\033[1;1H\033[K{text}\0338')
+        else:
+            self._write(text + '\n')
+
+    def partial(self, text: str):
+        """
+        Shows text as it arrives, without starting a new line.
+        """
+        if self.every == 0:
+            return
+        self._written = True
+        self._write(text)
+
+    def _size(self, map: Grid) -> tuple[int, int]:
+        if self.viewport is not None:
+            rows, columns = self.viewport
+        elif self.ansi:
+            # status line above and below the map and one line for other output
+            terminal = shutil.get_terminal_size()
+            rows, columns = terminal.lines - 3, terminal.columns
+        else:
+            rows, columns = map.rows, map.columns
+        return max(min(rows, map.rows), 1), max(min(columns, map.columns), 1)
+
+    def _place(self, map: Grid, drone: list) -> tuple[int, int, int, int]:
+        # keeps the window while the drone is away from its border, otherwise centres it on the drone
+        height, width = self._size(map)
+        if self._window is not None and self._window[2:] == (height, width):
+            top, left = self._window[:2]
+            if _away_from_border(drone[0], top, height, map.rows) and _away_from_border(drone[1], left, width, map.columns):
+                return self._window
+        top = min(max(drone[0] - height // 2, 0), map.rows - height)
+        left = min(max(drone[1] - width // 2, 0), map.columns - width)
+        return top, left, height, width
+
+    def render(self, state, force: bool = False):
+        """
+        Shows the map known to the drone, if it is due.
+
+        Parameters
+        ----------
+        state : EpisodeState
+            State of the episode.
+        force : bool, optional
+            Render even if the map is not due.
+        """
+        self.renders += 1
+        if self.every == 0 or (not force and (self.renders - 1) % self.every != 0):
+            return
+
+        drone_map, drone, target = state.drone_map, state.drone_position, state.target_position
+        window = self._place(drone_map, drone)
+        status = f'Open spaces: {check_walkable(drone_map, drone)}'
+        if not self.ansi:
+            self._write(show_level(drone_map, drone, target, window) + '\n' + status + '\n')
+            self._window = window
+            return
+
+        rows = frame_rows(drone_map, drone, target, *window)
+        first = self._frame is None or len(rows) != len(self._frame)
+        # the first frame clears the screen and leaves the cursor below the map, later
+        # frames keep the cursor where the text below the map stopped
+        parts = ['\033[2J'] if first else ['\0337']
+        if first and self._header is not None:
+            parts.append(f'\033[1;1H{self._header}')
+        if first or window != self._window:
+            # first frame or the window moved, draw everything
+            for i, row in enumerate(rows):
+                parts.append(f'\033[{i + 2};1H' + ''.join(MARKS.get(cell, chr(cell)) for cell in row) + '\033[K')
+        else:
+            for i, (old, new) in enumerate(zip(self._frame, rows)):
+                if old == new:
+                    continue
+                for j in range(len(new)):
+                    if old[j] != new[j]:
+                        parts.append(f'\033[{i + 2};{j + 1}H' + MARKS.get(new[j], chr(new[j])))
+        top, left = window[:2]
+        parts.append(f'\033[{len(rows) + 2};1H\033[K{status} (rows {top + 1}-{top + len(rows)}, columns {left + 1}-{left + window[3]})')
+        parts.append(f'\033[{len(rows) + 3};1H' if first else '\0338')
+        self._write(''.join(parts))
+        self._frame = rows
+        self._window = window
+
+    def close(self):
+        """
+        Moves the cursor below the map, so that following output does not overwrite it.
+
+        Nothing is cleared; if text was shown below the map, the cursor already follows it
+        and stays there. Calling it again does nothing.
+        """
+        if self.ansi and self._frame is not None and not self._written:
+            self._write(f'\033[{len(self._frame) + 3};1H')
+        self._frame = None
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+
+class CacheMiss(RuntimeError):
+    """
+    Raised in replay mode when a request was never recorded.
+    """
+
+def to_json_data(obj):
+    """
+    Converts messages, tools and other SDK objects to plain JSON data.
+    """
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode='json', exclude_none=True)
+    if isinstance(obj, (list, tuple)):
+        return [to_json_data(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: to_json_data(value) for key, value in obj.items()}
+    return obj
+
+class ResponseCache:
+    """
+    Content addressed cache for model responses stored on disk.
+
+    Modes
+    -----
+    'record'
+        Responses are taken from the cache, missing ones are requested and stored.
+    'replay'
+        Responses are only taken from the cache, a missing one raises CacheMiss.
+    'passthrough'
+        The cache is neither read nor written.
+
+    When the stored responses grow beyond max_bytes, the least recently used ones are removed.
+    """
+    MODES = ('record', 'replay', 'passthrough')
+
+    def __init__(self, directory: str = '.response_cache', mode: str = 'record', max_bytes: int = 256 * 2**20):
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown cache mode: {mode}')
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def key(self, messages: list, model: str, tools: list, system_instruction: str) -> str:
+        """
+        Computes the key of a request.
+
+        Parameters
+        ----------
+        messages : list
+            Messages of the request.
+        model : str
+            Name of the model.
+        tools : list
+            Tools given to the model.
+        system_instruction : str
+            System prompt of the request.
+
+        Returns
+        -------
+        str
+            sha256 hex digest of the serialized request.
+        """
+        request = {
+            'model': model,
+            'system_instruction': system_instruction,
+            'tools': to_json_data(tools),
+            'messages': to_json_data(messages),
+        }
+        serialized = json.dumps(request, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key: str) -> 'types.GenerateContentResponse | None':
+        """
+        Looks up a stored response.
+
+        Parameters
+        ----------
+        key : str
+            Key of the request.
+
+        Returns
+        -------
+        types.GenerateContentResponse or None
+            The stored response or None if the request has to be sent.
+
+        Raises
+        ------
+        CacheMiss
+            If the response is missing in replay mode.
+        """
+        if self.mode == 'passthrough':
+            return None
+        from google.genai import types
+
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                response = types.GenerateContentResponse.model_validate_json(f.read())
+        except FileNotFoundError:
+            self.misses += 1
+            if self.mode == 'replay':
+                raise CacheMiss(f'No recorded response for request {key}')
+            return None
+        # mark as recently used for the eviction
+        os.utime(path)
+        self.hits += 1
+        return response
+
+    def put(self, key: str, response: 'types.GenerateContentResponse'):
+        """
+        Stores a response, in record mode only.
+
+        Parameters
+        ----------
+        key : str
+            Key of the request.
+        response : types.GenerateContentResponse
+            Response to store.
+        """
+        if self.mode != 'record':
+            return
+        path = self._path(key)
+        size = self.size()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = response.model_dump_json(exclude_none=True)
+        # write to a temporary file first, so concurrent readers never see half a response
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        self._size = size + len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for subdirectory in os.scandir(self.directory):
+            if subdirectory.is_dir():
+                entries.extend(entry for entry in os.scandir(subdirectory.path) if entry.name.endswith('.json'))
+        return entries
+
+    def size(self) -> int:
+        """
+        Returns the number of bytes used by the stored responses.
+        """
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        return self._size
+
+    def evict(self):
+        """
+        Removes the least recently used responses until the cache fits into max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                break
+            size -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # already removed by another process
+                pass
+        self._size = size
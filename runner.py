@@ -0,0 +1,276 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+import config
+from config import user_prompt
+from backends import BACKENDS, Backend, create_client, create_backend
+from response_cache import ResponseCache
+from prompt_cache import PROMPT_CACHE_MODES, create_prompt_cache
+from scheduler import RequestScheduler, DeadlineExceeded
+from history import HistoryManager
+from tracing import Tracer
+from oracle import DistanceCache
+from level_catalog import LevelCatalog
+from episode import load_level, validate_positions, start_episode, astep, astream_step
+
+@dataclass
+class EpisodeSpec:
+    """
+    One episode of an evaluation: a level, drone and target position and a prompt.
+
+    Positions are 0-based, as used by the simulator.
+    """
+    level_file: str
+    start: list
+    target: list
+    prompt: str = user_prompt
+    prompt_name: str = 'user_prompt'
+
+def resolve_prompt(prompt: str | None) -> tuple[str, str]:
+    """
+    Looks up a prompt by its name in config.py.
+
+    Parameters
+    ----------
+    prompt : str or None
+        Name of a prompt in config.py (e.g. 'user_prompt_2') or the prompt text itself.
+
+    Returns
+    -------
+    (str, str)
+        Name and text of the prompt.
+    """
+    if prompt is None:
+        return 'user_prompt', user_prompt
+    if prompt.isidentifier() and isinstance(getattr(config, prompt, None), str):
+        return prompt, getattr(config, prompt)
+    return 'custom', prompt
+
+def load_manifest(manifest_file: str) -> list[EpisodeSpec]:
+    """
+    Reads episodes from a JSONL manifest.
+
+    Every line is an object like
+    {"level": "Level_1.lvl", "start": [3, 2], "target": [5, 2], "prompt": "user_prompt_3"}
+    with positions given as X,Y starting from 1, as in the interactive mode of main.py.
+    "prompt" is optional and is either a prompt name from config.py or the prompt text.
+
+    Parameters
+    ----------
+    manifest_file : str
+        Path of the manifest.
+
+    Returns
+    -------
+    list[EpisodeSpec]
+        The episodes in the manifest.
+    """
+    specs = []
+    with open(manifest_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            prompt_name, prompt = resolve_prompt(entry.get('prompt'))
+            specs.append(EpisodeSpec(
+                level_file=entry['level'],
+                start=[entry['start'][0]-1, entry['start'][1]-1],
+                target=[entry['target'][0]-1, entry['target'][1]-1],
+                prompt=prompt,
+                prompt_name=prompt_name,
+            ))
+    return specs
+
+async def run_episode(backend: Backend, spec: EpisodeSpec, max_steps: int = 1000, history: HistoryManager | None = None, trace_file=None, oracle: DistanceCache | None = None, catalog: LevelCatalog | None = None, deadline: float | None = None, verbose: bool = False, stream: bool = False) -> dict:
+    """
+    Runs a single episode until the model gives a final response or max_steps is reached.
+
+    Parameters
+    ----------
+    backend : Backend
+        Backend used.
+    spec : EpisodeSpec
+        Episode to run.
+    max_steps : int, optional
+        Maximal number of model calls.
+    history : HistoryManager, optional
+        Keeps the messages sent per request within a budget.
+    trace_file : file, optional
+        Open file the timings and token counts of every step are written to.
+    oracle : DistanceCache, optional
+        Scores the moves of the drone against the shortest path.
+    catalog : LevelCatalog, optional
+        Rejects targets that cannot be reached before any model call.
+    deadline : float, optional
+        Seconds the episode may take, it fails with DeadlineExceeded afterwards.
+    verbose : boolean, optional
+        whether every step should be printed
+    stream : boolean, optional
+        whether responses are streamed, executing function calls as they arrive
+
+    Returns
+    -------
+    dict
+        Result of the episode.
+    """
+    result = {
+        'level': spec.level_file,
+        'start': [spec.start[0]+1, spec.start[1]+1],
+        'target': [spec.target[0]+1, spec.target[1]+1],
+        'prompt': spec.prompt_name,
+        'success': False,
+        'finished': False,
+        'steps': 0,
+        'moves': 0,
+        'final_text': None,
+        'error': None,
+    }
+    tracer = Tracer(trace_file, episode=f"{spec.level_file} {result['start']} -> {result['target']} ({spec.prompt_name})")
+    start_time = time.perf_counter()
+    try:
+        # the oracle keeps one Grid per level, so the episodes of a level share what is cached for it
+        level = oracle.level(spec.level_file) if oracle is not None else load_level(spec.level_file)
+        validate_positions(level, spec.start, spec.target)
+        if catalog is not None:
+            catalog.validate(spec.level_file, spec.start, spec.target)
+        state = start_episode(spec.level_file, level, spec.start, spec.target, spec.prompt, backend=backend)
+        if deadline is not None:
+            state.deadline = time.monotonic() + deadline
+        step = astream_step if stream else astep
+        for _ in range(max_steps):
+            if state.deadline is not None and time.monotonic() > state.deadline:
+                raise DeadlineExceeded("Deadline of the episode exceeded.")
+            if await step(backend, state, history=history, tracer=tracer, verbose=verbose):
+                break
+        result.update(
+            success=state.reached_target,
+            finished=state.finished,
+            steps=state.steps,
+            moves=state.moves,
+            final_text=state.final_text,
+        )
+        if oracle is not None:
+            result['score'] = oracle.score(spec.level_file, spec.start, spec.target, state.moves, state.reached_target)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['wall_time'] = time.perf_counter() - start_time
+    result['trace'] = tracer.close()
+    return result
+
+async def run_episodes(backend: Backend, specs: list[EpisodeSpec], concurrency: int = 8, max_steps: int = 1000, history: HistoryManager | None = None, trace_file=None, oracle: DistanceCache | None = None, catalog: LevelCatalog | None = None, deadline: float | None = None, on_result=None, stream: bool = False) -> list[dict]:
+    """
+    Runs many episodes concurrently on one backend.
+
+    Parameters
+    ----------
+    backend : Backend
+        Backend shared by all episodes.
+    specs : list[EpisodeSpec]
+        Episodes to run.
+    concurrency : int, optional
+        Maximal number of episodes running at the same time.
+    max_steps : int, optional
+        Maximal number of model calls per episode.
+    history : HistoryManager, optional
+        Keeps the messages sent per request within a budget.
+    trace_file : file, optional
+        Open file the timings and token counts of every step are written to.
+    oracle : DistanceCache, optional
+        Scores the moves of the drones against the shortest paths.
+    catalog : LevelCatalog, optional
+        Rejects targets that cannot be reached before any model call.
+    deadline : float, optional
+        Seconds every episode may take.
+    on_result : callable, optional
+        Called with every result as soon as its episode is done.
+    stream : boolean, optional
+        whether responses are streamed
+
+    Returns
+    -------
+    list[dict]
+        Results in the order of the specs.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(spec: EpisodeSpec) -> dict:
+        async with semaphore:
+            result = await run_episode(backend, spec, max_steps=max_steps, history=history, trace_file=trace_file, oracle=oracle, catalog=catalog, deadline=deadline, stream=stream)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return await asyncio.gather(*(limited(spec) for spec in specs))
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs pathfinding episodes without user interaction.")
+    parser.add_argument("manifest", help="JSONL file with one episode per line")
+    parser.add_argument("--concurrency", type=int, default=8, help="episodes running at the same time")
+    parser.add_argument("--max-steps", type=int, default=1000, help="maximal model calls per episode")
+    parser.add_argument("--output", help="JSONL file the results are written to")
+    parser.add_argument("--cache", choices=ResponseCache.MODES, help="record responses to or replay them from the response cache")
+    parser.add_argument("--cache-dir", default=".response_cache", help="directory of the response cache")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="Gemini or a local scripted stand-in")
+    parser.add_argument("--seed", type=int, help="seed of the scripted backends")
+    parser.add_argument("--history-messages", type=int, help="maximal number of messages sent per request")
+    parser.add_argument("--history-tokens", type=int, help="maximal estimated number of tokens sent per request")
+    parser.add_argument("--trace", help="JSONL file timings and token counts of every step are written to")
+    parser.add_argument("--rpm", type=float, help="maximal requests per minute to Gemini")
+    parser.add_argument("--tpm", type=float, help="maximal tokens per minute to Gemini")
+    parser.add_argument("--max-retries", type=int, default=6, help="retries of a request failing with a rate limit or server error")
+    parser.add_argument("--prompt-cache", choices=PROMPT_CACHE_MODES, help="send system prompt, tools and user prompt once as cached content on Gemini or in memory")
+    parser.add_argument("--prompt-cache-ttl", type=int, default=3600, help="seconds the cached content lives, it is refreshed while in use")
+    parser.add_argument("--stream", action="store_true", help="stream responses and execute function calls as soon as they arrive")
+    parser.add_argument("--deadline", type=float, help="seconds every episode may take")
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache_dir, mode=args.cache) if args.cache else None
+    history = None
+    if args.history_messages or args.history_tokens:
+        history = HistoryManager(max_messages=args.history_messages, max_tokens=args.history_tokens)
+
+    # Obtain API key and initiate the gemini client, the scripted backends and replaying from the cache work offline
+    client = create_client(args.backend, args.cache)
+
+    specs = load_manifest(args.manifest)
+    if specs == []:
+        print("No episodes found!")
+        sys.exit(1)
+
+    client, prompt_cache = create_prompt_cache(client, args.prompt_cache, ttl=args.prompt_cache_ttl)
+    scheduler = RequestScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, max_retries=args.max_retries, seed=args.seed)
+    backend = create_backend(args.backend, client=client, cache=cache, seed=args.seed, scheduler=scheduler, prompt_cache=prompt_cache)
+
+    output = open(args.output, "w") if args.output else None
+    trace_file = open(args.trace, "w") if args.trace else None
+
+    def on_result(result: dict):
+        if output is not None:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+        status = 'error' if result['error'] else ('success' if result['success'] else 'failed')
+        efficiency = f", efficiency {result['score']['efficiency']:.2f}" if 'score' in result else ''
+        print(f"{result['level']} {result['start']} -> {result['target']} ({result['prompt']}): {status} after {result['steps']} steps{efficiency}")
+
+    try:
+        results = asyncio.run(run_episodes(backend, specs, concurrency=args.concurrency, max_steps=args.max_steps, history=history, trace_file=trace_file, oracle=DistanceCache(), catalog=LevelCatalog(), deadline=args.deadline, on_result=on_result, stream=args.stream))
+    finally:
+        if prompt_cache is not None:
+            prompt_cache.close()
+        if output is not None:
+            output.close()
+        if trace_file is not None:
+            trace_file.close()
+
+    successes = sum(result['success'] for result in results)
+    print(f'{successes} of {len(results)} episodes reached the target.')
+    if scheduler.retries or scheduler.waited:
+        print(f'Requests retried: {scheduler.retries}, waited {scheduler.waited:.1f} s for rate limits and retries.')
+
+
+if __name__ == "__main__":
+    main()
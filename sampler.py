@@ -0,0 +1,188 @@
+import sys
+import json
+import random
+import argparse
+
+from level_catalog import LevelCatalog
+from oracle import DistanceCache
+
+DEFAULT_BUCKETS = ((1, 5), (6, 20), (21, None))
+
+def parse_buckets(text: str) -> list[tuple[int, int | None]]:
+    """
+    Parses distance buckets like '1-5,6-20,21+'.
+
+    Parameters
+    ----------
+    text : str
+        Comma separated ranges 'low-high' or 'low+' (no upper bound).
+
+    Returns
+    -------
+    list[tuple[int, int | None]]
+        Lower and upper bound of every bucket, both included.
+    """
+    buckets = []
+    for part in text.split(','):
+        part = part.strip()
+        if part.endswith('+'):
+            buckets.append((int(part[:-1]), None))
+        else:
+            low, high = part.split('-')
+            buckets.append((int(low), int(high)))
+    return buckets
+
+def bucket_name(bucket: tuple[int, int | None]) -> str:
+    low, high = bucket
+    return f'{low}+' if high is None else f'{low}-{high}'
+
+def _random_target(rng: random.Random, info, attempts: int = 10000) -> list | None:
+    # a random free cell with at least one free neighbour in its region
+    for _ in range(attempts):
+        target = [rng.randrange(info.rows), rng.randrange(info.columns)]
+        region = info.component(target)
+        if region >= 0 and info.component_sizes[region] > 1:
+            return target
+    return None
+
+def _starts_in_bucket(rng: random.Random, distances, rows: int, columns: int, target: list, bucket: tuple[int, int | None], count: int, attempts: int = 50) -> list[tuple[list, int]]:
+    # starts with a shortest path length within the bucket, drawn without repetition
+    low, high = bucket
+    if high is not None and (2 * high + 1) ** 2 < rows * columns:
+        # the shortest path is never shorter than the Manhattan distance,
+        # so only the cells around the target need to be looked at
+        x, y = target
+        candidates = []
+        for i in range(max(x - high, 0), min(x + high + 1, rows)):
+            for j in range(max(y - high, 0), min(y + high + 1, columns)):
+                distance = distances[i * columns + j]
+                if low <= distance <= high:
+                    candidates.append(([i, j], distance))
+        return rng.sample(candidates, min(count, len(candidates)))
+
+    # far buckets cover most of a large level, random cells are accepted often enough
+    chosen = {}
+    for _ in range(count * attempts):
+        if len(chosen) == count:
+            break
+        index = rng.randrange(rows * columns)
+        distance = distances[index]
+        if distance >= low and (high is None or distance <= high) and index not in chosen:
+            chosen[index] = distance
+    if len(chosen) < count:
+        # few matching cells, look at all of them
+        candidates = [
+            index for index, distance in enumerate(distances)
+            if distance >= low and (high is None or distance <= high) and index not in chosen
+        ]
+        for index in rng.sample(candidates, min(count - len(chosen), len(candidates))):
+            chosen[index] = distances[index]
+    return [([index // columns, index % columns], distance) for index, distance in chosen.items()]
+
+def sample_pairs(level_file: str, pairs: int, seed: int | None = None, targets: int = 16, buckets=DEFAULT_BUCKETS, catalog: LevelCatalog | None = None, oracle: DistanceCache | None = None) -> list[dict]:
+    """
+    Draws start and target pairs of a level, stratified by the length of the shortest path.
+
+    A few targets are drawn and one distance field is computed per target, the starts
+    of all pairs of a target are drawn from its field. Every bucket gets the same share
+    of the pairs, fewer if the targets have not enough starts at that distance.
+
+    Parameters
+    ----------
+    level_file : str
+        Path of the level file.
+    pairs : int
+        Number of pairs to draw.
+    seed : int, optional
+        Seed, the same seed gives the same pairs.
+    targets : int, optional
+        Number of distinct targets, each needs one breadth first search.
+    buckets : list, optional
+        Lower and upper bound (None for no bound) of the path length of every bucket.
+    catalog : LevelCatalog, optional
+        Catalog with the connected regions of the level.
+    oracle : DistanceCache, optional
+        Cache of the distance fields.
+
+    Returns
+    -------
+    list[dict]
+        Manifest entries with positions starting from 1, as read by runner.py,
+        with the shortest path length and the bucket added.
+    """
+    rng = random.Random(seed)
+    catalog = catalog or LevelCatalog()
+    oracle = oracle or DistanceCache()
+    info = catalog.info(level_file)
+
+    chosen_targets = []
+    for _ in range(targets):
+        target = _random_target(rng, info)
+        if target is None:
+            break
+        if target not in chosen_targets:
+            chosen_targets.append(target)
+    if chosen_targets == []:
+        return []
+
+    entries = []
+    for k, bucket in enumerate(buckets):
+        # spread the pairs of a bucket evenly over the targets, pairs a target
+        # cannot provide are taken over by the following targets
+        remaining = pairs // len(buckets) + (k < pairs % len(buckets))
+        for t, target in enumerate(chosen_targets):
+            count = -(-remaining // (len(chosen_targets) - t))
+            if count == 0:
+                break
+            distances = oracle.distances(level_file, target)
+            starts = _starts_in_bucket(rng, distances, info.rows, info.columns, target, bucket, count)
+            remaining -= len(starts)
+            for start, distance in starts:
+                entries.append({
+                    'level': level_file,
+                    'start': [start[0]+1, start[1]+1],
+                    'target': [target[0]+1, target[1]+1],
+                    'distance': distance,
+                    'bucket': bucket_name(bucket),
+                })
+    rng.shuffle(entries)
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Draws start and target pairs stratified by shortest path length and writes them as a manifest for runner.py.")
+    parser.add_argument("levels", nargs="+", help="level files")
+    parser.add_argument("--pairs", type=int, default=100, help="pairs per level")
+    parser.add_argument("--seed", type=int, default=0, help="seed, the same seed gives the same pairs")
+    parser.add_argument("--targets", type=int, default=16, help="distinct targets per level, one breadth first search each")
+    parser.add_argument("--buckets", default="1-5,6-20,21+", help="shortest path length buckets")
+    parser.add_argument("--prompt", help="prompt name from config.py added to every episode")
+    parser.add_argument("--output", help="manifest file, printed if not given")
+    args = parser.parse_args()
+
+    buckets = parse_buckets(args.buckets)
+    catalog = LevelCatalog()
+    oracle = DistanceCache()
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for n, level_file in enumerate(args.levels):
+            try:
+                entries = sample_pairs(level_file, args.pairs, seed=args.seed + n, targets=args.targets, buckets=buckets, catalog=catalog, oracle=oracle)
+            except ValueError:
+                print(f"{level_file}: Level file corrupt", file=sys.stderr)
+                sys.exit(1)
+            for entry in entries:
+                if args.prompt:
+                    entry['prompt'] = args.prompt
+                output.write(json.dumps(entry) + '\n')
+            counts = ', '.join(
+                f"{bucket_name(bucket)}: {sum(entry['bucket'] == bucket_name(bucket) for entry in entries)}"
+                for bucket in buckets
+            )
+            print(f'{level_file}: {len(entries)} pairs ({counts})', file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
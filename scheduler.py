@@ -0,0 +1,236 @@
+import sys
+import time
+import random
+import asyncio
+import threading
+
+from history import estimate_tokens
+
+# status codes of errors worth retrying: rate limit exceeded and temporary server errors
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a request cannot be answered before the deadline of its episode.
+    """
+
+class TokenBucket:
+    """
+    Limits a rate per minute, e.g. requests or tokens.
+
+    The bucket holds up to one minute of the rate and refills continuously. Taking more
+    than it holds is allowed, the caller is told how long to wait for the tokens instead,
+    so waiting callers are served in the order they arrived.
+
+    Parameters
+    ----------
+    per_minute : float
+        Rate per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self._updated) * self.per_minute / 60, self.per_minute)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes tokens from the bucket.
+
+        Parameters
+        ----------
+        amount : float
+            Number of tokens taken.
+
+        Returns
+        -------
+        float
+            Seconds to wait until the tokens are available.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(-self.tokens * 60 / self.per_minute, 0.0)
+
+    def adjust(self, amount: float):
+        """
+        Takes further tokens (or returns tokens if negative) after the actual amount is known.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens - amount, self.per_minute)
+
+def retryable(error: Exception) -> bool:
+    """
+    Whether a request that failed with error should be retried.
+    """
+    # errors of the Gemini SDK can only occur once it was imported
+    errors = sys.modules.get('google.genai.errors')
+    return errors is not None and isinstance(error, errors.APIError) and error.code in RETRY_CODES
+
+class RequestScheduler:
+    """
+    Sends requests within the rate limits and retries them on rate limit and server errors.
+
+    One scheduler is shared by all episodes using the same backend, so the limits hold
+    for all of them together. Failed requests are retried with exponential backoff and
+    full jitter. Episodes with a deadline fail with DeadlineExceeded instead of waiting
+    beyond it.
+
+    Parameters
+    ----------
+    requests_per_minute : float, optional
+        Maximal requests per minute, unlimited if not given.
+    tokens_per_minute : float, optional
+        Maximal tokens per minute, unlimited if not given. The tokens of a request are
+        estimated before it is sent and corrected with the counts of the response.
+    max_retries : int, optional
+        Retries of a failed request before the error is raised.
+    base_delay : float, optional
+        Seconds of the first backoff, doubled with every retry.
+    max_delay : float, optional
+        Maximal seconds of a backoff.
+    seed : int, optional
+        Seed of the jitter.
+    """
+
+    def __init__(self, requests_per_minute: float | None = None, tokens_per_minute: float | None = None, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0, seed: int | None = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random(seed)
+        self.retries = 0
+        self.waited = 0.0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Seconds to wait before retry number attempt (starting from 0), with full jitter.
+        """
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _reserve(self, messages: list) -> tuple[float, int]:
+        # seconds to wait before sending and the estimated tokens of the request
+        estimate = sum(estimate_tokens(message) for message in messages)
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(estimate))
+        return delay, estimate
+
+    def _settle(self, response, estimate: int):
+        # corrects the tokens taken with the actual count of the response
+        usage = getattr(response, 'usage_metadata', None)
+        if self.tokens is not None and usage is not None and usage.total_token_count is not None:
+            self.tokens.adjust(usage.total_token_count - estimate)
+
+    def settle(self, response, messages: list):
+        """
+        Corrects the tokens taken for a request sent with settle=False, e.g. a streamed
+        request whose token counts are only known after its last chunk.
+
+        Parameters
+        ----------
+        response : types.GenerateContentResponse
+            Whole response of the request, e.g. the merged chunks.
+        messages : list
+            Messages of the request, as passed to run.
+        """
+        self._settle(response, sum(estimate_tokens(message) for message in messages))
+
+    def _refund(self, estimate: int, sent: bool = True):
+        # a failed request used no tokens, a request that was not sent no request either
+        if self.tokens is not None:
+            self.tokens.adjust(-estimate)
+        if self.requests is not None and not sent:
+            self.requests.adjust(-1)
+
+    def _check_deadline(self, delay: float, deadline: float | None, estimate: int | None = None):
+        if deadline is not None and time.monotonic() + delay > deadline:
+            if estimate is not None:
+                self._refund(estimate, sent=False)
+            raise DeadlineExceeded("Deadline of the episode exceeded.")
+
+    def run(self, request, messages: list, deadline: float | None = None, settle: bool = True):
+        """
+        Sends a request as soon as the limits allow, retrying it if it fails.
+
+        Parameters
+        ----------
+        request : callable
+            Sends the request and returns the response.
+        messages : list
+            Messages of the request, used to estimate its tokens.
+        deadline : float, optional
+            time.monotonic() by which the response is needed.
+        settle : bool, optional
+            Whether the tokens taken are corrected with the counts of the response. If
+            not, the caller corrects them with settle once the response is complete.
+
+        Returns
+        -------
+        response
+            Response of the request.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the response cannot be received before the deadline.
+        genai.errors.APIError
+            If the request still fails after max_retries retries, or fails with an error that is not retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay, estimate = self._reserve(messages)
+            self._check_deadline(delay, deadline, estimate)
+            if delay > 0:
+                self.waited += delay
+                time.sleep(delay)
+            try:
+                response = request()
+            except Exception as e:
+                self._refund(estimate)
+                if not retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                self._check_deadline(delay, deadline)
+                self.retries += 1
+                self.waited += delay
+                time.sleep(delay)
+                continue
+            if settle:
+                self._settle(response, estimate)
+            return response
+
+    async def arun(self, request, messages: list, deadline: float | None = None, settle: bool = True):
+        """
+        Same as run, for use in an event loop. request returns an awaitable.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay, estimate = self._reserve(messages)
+            self._check_deadline(delay, deadline, estimate)
+            if delay > 0:
+                self.waited += delay
+                await asyncio.sleep(delay)
+            try:
+                response = await request()
+            except Exception as e:
+                self._refund(estimate)
+                if not retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                self._check_deadline(delay, deadline)
+                self.retries += 1
+                self.waited += delay
+                await asyncio.sleep(delay)
+                continue
+            if settle:
+                self._settle(response, estimate)
+            return response
@@ -0,0 +1,191 @@
+import json
+import math
+import time
+from contextlib import contextmanager, nullcontext
+
+from response_cache import to_json_data
+
+def percentile(values: list, q: float) -> float | None:
+    """
+    Nearest rank percentile of a list of values.
+
+    Parameters
+    ----------
+    values : list
+        Values, in any order.
+    q : float
+        Percentile between 0 and 100.
+
+    Returns
+    -------
+    float or None
+        The percentile, None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+class Tracer:
+    """
+    Records timings, token counts and payload sizes of every step of an episode.
+
+    Every step is written as one JSON line to output (if given), the summary of the
+    episode is written as a last line with "type": "summary".
+
+    Parameters
+    ----------
+    output : file, optional
+        Open text file the records are written to, may be shared by several tracers.
+    episode : str, optional
+        Label of the episode, added to every record.
+    """
+
+    def __init__(self, output=None, episode: str | None = None):
+        self.output = output
+        self.episode = episode
+        self.steps = []
+        self._phases = {}
+        self._payload = 0
+        self._first_action = None
+        # id of a message -> (message, serialized size), the messages of the previous request
+        self._sizes = {}
+
+    @contextmanager
+    def timed(self, phase: str):
+        """
+        Adds the wall time spent in the with block to a phase of the current step.
+
+        Parameters
+        ----------
+        phase : str
+            'model', 'tools' or 'render'.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[phase] = self._phases.get(phase, 0.0) + time.perf_counter() - start
+
+    def request(self, messages: list):
+        """
+        Notes the size of the messages sent with the current step.
+
+        Only messages that were not part of the previous request are serialized, so the
+        cost of a step does not grow with the length of the conversation.
+
+        Parameters
+        ----------
+        messages : list
+            Messages of the request.
+        """
+        sizes = {}
+        for message in messages:
+            entry = self._sizes.get(id(message))
+            if entry is None or entry[0] is not message:
+                entry = (message, len(json.dumps(to_json_data(message), separators=(',', ':'))))
+            sizes[id(message)] = entry
+        self._sizes = sizes
+        # size of the serialized list: the messages, the commas between them and the brackets
+        self._payload = sum(sizes[id(message)][1] for message in messages) + max(len(messages) - 1, 0) + 2
+
+    def first_action(self, seconds: float):
+        """
+        Notes the time from the request to the first function call executed in the current step, when streaming.
+        """
+        self._first_action = seconds
+
+    def record(self, state, response, tools: list[str], moves: int):
+        """
+        Finishes the current step.
+
+        Parameters
+        ----------
+        state : EpisodeState
+            State of the episode after the step.
+        response : types.GenerateContentResponse
+            Response of the model.
+        tools : list[str]
+            Names of the functions called in the step.
+        moves : int
+            Number of successful moves in the step.
+        """
+        usage = response.usage_metadata
+        entry = {
+            'type': 'step',
+            'episode': self.episode,
+            'step': state.steps - 1,
+            'model_time': self._phases.get('model', 0.0),
+            'tool_time': self._phases.get('tools', 0.0),
+            'render_time': self._phases.get('render', 0.0),
+            'prompt_tokens': usage.prompt_token_count if usage else None,
+            'candidate_tokens': usage.candidates_token_count if usage else None,
+            'total_tokens': usage.total_token_count if usage else None,
+            'payload_bytes': self._payload,
+            'tools': tools,
+            'moves': moves,
+        }
+        if self._first_action is not None:
+            entry['first_action_time'] = self._first_action
+        self.steps.append(entry)
+        if self.output is not None:
+            self.output.write(json.dumps(entry) + '\n')
+        self._phases = {}
+        self._payload = 0
+        self._first_action = None
+
+    def summary(self) -> dict:
+        """
+        Summarizes the recorded steps.
+
+        Returns
+        -------
+        dict
+            Step count, p50/p95 of the model and tool times, token totals and tokens per successful move.
+        """
+        model_times = [step['model_time'] for step in self.steps]
+        tool_times = [step['tool_time'] for step in self.steps]
+        total_tokens = sum(step['total_tokens'] or 0 for step in self.steps)
+        moves = sum(step['moves'] for step in self.steps)
+        return {
+            'type': 'summary',
+            'episode': self.episode,
+            'steps': len(self.steps),
+            'model_time': sum(model_times),
+            'model_time_p50': percentile(model_times, 50),
+            'model_time_p95': percentile(model_times, 95),
+            'tool_time': sum(tool_times),
+            'tool_time_p50': percentile(tool_times, 50),
+            'tool_time_p95': percentile(tool_times, 95),
+            'render_time': sum(step['render_time'] for step in self.steps),
+            'prompt_tokens': sum(step['prompt_tokens'] or 0 for step in self.steps),
+            'candidate_tokens': sum(step['candidate_tokens'] or 0 for step in self.steps),
+            'total_tokens': total_tokens,
+            'payload_bytes': sum(step['payload_bytes'] for step in self.steps),
+            'moves': moves,
+            'tokens_per_move': total_tokens / moves if moves else None,
+        }
+
+    def close(self) -> dict:
+        """
+        Writes the summary of the episode.
+
+        Returns
+        -------
+        dict
+            The summary.
+        """
+        summary = self.summary()
+        if self.output is not None:
+            self.output.write(json.dumps(summary) + '\n')
+            self.output.flush()
+        return summary
+
+def timed(tracer: Tracer | None, phase: str):
+    """
+    tracer.timed(phase), or a context doing nothing without a tracer.
+    """
+    if tracer is None:
+        return nullcontext()
+    return tracer.timed(phase)
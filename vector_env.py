@@ -0,0 +1,240 @@
+import sys
+import time
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from functions import allowed_functions
+from functions.allowed_functions import DIRECTIONS
+from functions.grid import Grid
+from functions.visibility import Visibility
+from level_io import load_level
+
+FREE = ord(' ')
+WALL = ord('X')
+UNKNOWN = ord('?')
+
+# actions are indices into DIRECTIONS: 0 north, 1 south, 2 west, 3 east, -1 stays
+ACTIONS = list(DIRECTIONS)
+
+class VectorEnv:
+    """
+    Many drones stepped at once, with levels and known maps held as NumPy arrays.
+
+    Every step validates the moves of all drones against their known maps, moves the
+    drones, reveals the cells they see and returns the observations of all environments,
+    with the same rules as the tools given to the model. Levels are padded with walls to
+    a common size plus a border as wide as the sensor radius, so no bounds checks are
+    needed; positions are reported in level coordinates.
+
+    Parameters
+    ----------
+    levels : list[Grid]
+        Level of every environment. Environments given the same Grid object share its array.
+    starts : list
+        Starting coordinates of every drone.
+    targets : list
+        Coordinates of every target.
+    visibility : Visibility, optional
+        Sensor radius and occlusion, those of the tools (config.sensor_radius and
+        config.sensor_occlusion) if not given.
+    """
+
+    def __init__(self, levels: list[Grid], starts: list, targets: list, visibility: Visibility | None = None):
+        if np is None:
+            raise ImportError("The vectorized environment needs numpy, install it with: pip install .[vector]")
+        if not len(levels) == len(starts) == len(targets):
+            raise ValueError("One level, start and target is needed per environment")
+
+        self.visibility = visibility if visibility is not None else allowed_functions.visibility
+        self.border = border = self.visibility.radius
+        rows = max(level.rows for level in levels) + 2 * border
+        columns = max(level.columns for level in levels) + 2 * border
+        slots = {}
+        for level in levels:
+            slots.setdefault(id(level), (len(slots), level))
+        self.levels = np.full((len(slots), rows, columns), WALL, dtype=np.uint8)
+        for slot, level in slots.values():
+            cells = np.frombuffer(level.cells, dtype=np.uint8).reshape(level.rows, level.columns)
+            self.levels[slot, border:level.rows + border, border:level.columns + border] = cells
+        self.level_slot = np.array([slots[id(level)][0] for level in levels], dtype=np.intp)
+        self.shapes = np.array([level.shape for level in levels], dtype=np.intp)
+
+        self.count = len(levels)
+        self.index = np.arange(self.count)
+        self.starts = np.array(starts, dtype=np.intp) + border
+        self.targets = np.array(targets, dtype=np.intp) + border
+        offsets = self.visibility.offsets
+        self.offset_x = np.array([dx for dx, _ in offsets], dtype=np.intp)
+        self.offset_y = np.array([dy for _, dy in offsets], dtype=np.intp)
+        self.dx = np.array([DIRECTIONS[action][0] for action in ACTIONS] + [0], dtype=np.intp)
+        self.dy = np.array([DIRECTIONS[action][1] for action in ACTIONS] + [0], dtype=np.intp)
+        self.reset()
+
+    def reset(self) -> dict:
+        """
+        Puts all drones back to their start with an unknown map.
+
+        Returns
+        -------
+        dict
+            Observations of all environments, see step.
+        """
+        self.drone_maps = np.full((self.count,) + self.levels.shape[1:], UNKNOWN, dtype=np.uint8)
+        # cells outside the levels are known walls
+        rows, columns = self.levels.shape[1:]
+        border = self.border
+        inside = (np.arange(rows)[None, :, None] >= border) & (np.arange(rows)[None, :, None] < self.shapes[:, 0, None, None] + border) & \
+                 (np.arange(columns)[None, None, :] >= border) & (np.arange(columns)[None, None, :] < self.shapes[:, 1, None, None] + border)
+        self.drone_maps[~inside] = WALL
+        self.positions = self.starts.copy()
+        self.moves = np.zeros(self.count, dtype=np.int64)
+        self.done = np.all(self.positions == self.targets, axis=1)
+        self._reveal(self.index)
+        return self.observations(np.zeros(self.count, dtype=bool))
+
+    def _reveal(self, environments):
+        # copies the cells the drones of the given environments see from their levels
+        if not self.visibility.occlusion:
+            x = self.positions[environments, 0, None] + self.offset_x
+            y = self.positions[environments, 1, None] + self.offset_y
+            slots = self.level_slot[environments, None]
+            self.drone_maps[environments[:, None], x, y] = self.levels[slots, x, y]
+            return
+
+        # with occlusion every offset is checked for all drones at once, along the same lines
+        # of sight as Visibility; the lines stay inside the levels, only the cells seen may
+        # lie in the border, which is known already
+        x, y = self.positions[environments, 0], self.positions[environments, 1]
+        slots = self.level_slot[environments]
+        for (dx, dy), (between, corners) in self.visibility.lines.items():
+            seen = np.ones(len(environments), dtype=bool)
+            for i, j in between:
+                seen &= self.levels[slots, x + i, y + j] != WALL
+            for (i0, j0), (i1, j1) in corners:
+                seen &= (self.levels[slots, x + i0, y + j0] != WALL) | (self.levels[slots, x + i1, y + j1] != WALL)
+            seeing = environments[seen]
+            self.drone_maps[seeing, x[seen] + dx, y[seen] + dy] = self.levels[slots[seen], x[seen] + dx, y[seen] + dy]
+
+    def walkable(self):
+        """
+        Directions every drone can move in on its known map, as a (N, 4) boolean array in the order of ACTIONS.
+        """
+        x = self.positions[:, 0, None] + self.dx[None, :4]
+        y = self.positions[:, 1, None] + self.dy[None, :4]
+        return self.drone_maps[self.index[:, None], x, y] == FREE
+
+    def observations(self, success) -> dict:
+        """
+        Observations of all environments.
+
+        Returns
+        -------
+        dict
+            'positions': (N, 2) coordinates of the drones,
+            'walkable': (N, 4) directions the drones can move in,
+            'success': (N,) whether the last move of a drone succeeded,
+            'done': (N,) whether a drone reached its target,
+            'moves': (N,) successful moves of the drones.
+        """
+        return {
+            'positions': self.positions - self.border,
+            'walkable': self.walkable(),
+            'success': success,
+            'done': self.done.copy(),
+            'moves': self.moves.copy(),
+        }
+
+    def step(self, actions) -> dict:
+        """
+        Applies one action per environment.
+
+        A drone only moves into a free cell of its known map, drones that reached their
+        target do not move anymore.
+
+        Parameters
+        ----------
+        actions : array
+            (N,) integer actions, indices into ACTIONS or -1 to stay.
+
+        Returns
+        -------
+        dict
+            Observations of all environments, see observations.
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        x = self.positions[:, 0] + self.dx[actions]
+        y = self.positions[:, 1] + self.dy[actions]
+        success = (actions >= 0) & ~self.done & (self.drone_maps[self.index, x, y] == FREE)
+
+        moved = self.index[success]
+        self.positions[moved, 0] = x[moved]
+        self.positions[moved, 1] = y[moved]
+        self.moves[moved] += 1
+        self._reveal(moved)
+        self.done[moved] = np.all(self.positions[moved] == self.targets[moved], axis=1)
+        return self.observations(success)
+
+    def drone_map(self, environment: int) -> Grid:
+        """
+        Known map of one environment, as used by the tools.
+        """
+        rows, columns = self.shapes[environment]
+        cells = self.drone_maps[environment, self.border:rows + self.border, self.border:columns + self.border]
+        return Grid(int(rows), int(columns), cells=bytearray(cells.tobytes()))
+
+def random_actions(walkable, rng):
+    """
+    Random walkable direction for every drone, -1 for drones that cannot move.
+
+    Parameters
+    ----------
+    walkable : array
+        (N, 4) walkable directions, see VectorEnv.walkable.
+    rng : numpy.random.Generator
+        Random numbers.
+
+    Returns
+    -------
+    array
+        (N,) actions.
+    """
+    scores = rng.random(walkable.shape) * walkable
+    actions = scores.argmax(axis=1)
+    return np.where(walkable.any(axis=1), actions, -1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the env-steps per second of random drones in the vectorized environment.")
+    parser.add_argument("level", help="level file")
+    parser.add_argument("start", help="starting position as X,Y starting from 1")
+    parser.add_argument("target", help="target position as X,Y starting from 1")
+    parser.add_argument("--envs", type=int, default=1024, help="number of environments")
+    parser.add_argument("--steps", type=int, default=1000, help="steps of every environment")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random drones")
+    args = parser.parse_args()
+
+    if np is None:
+        print("The vectorized environment needs numpy, install it with: pip install .[vector]")
+        sys.exit(1)
+
+    level = load_level(args.level)
+    start = [int(value) - 1 for value in args.start.split(',')]
+    target = [int(value) - 1 for value in args.target.split(',')]
+    env = VectorEnv([level] * args.envs, [start] * args.envs, [target] * args.envs)
+    rng = np.random.default_rng(args.seed)
+
+    observation = env.reset()
+    begin = time.perf_counter()
+    for _ in range(args.steps):
+        observation = env.step(random_actions(observation['walkable'], rng))
+    elapsed = time.perf_counter() - begin
+
+    print(f'{args.envs * args.steps / elapsed:.0f} env-steps per second, '
+          f"{int(observation['done'].sum())} of {args.envs} drones reached the target")
+
+
+if __name__ == "__main__":
+    main()